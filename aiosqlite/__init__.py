@@ -21,7 +21,18 @@ from sqlite3 import (  # pylint: disable=redefined-builtin
 
 __author__ = "Amethyst Reese"
 from .__version__ import __version__
-from .core import connect, Connection, Cursor
+from .bulk import BulkInsertResult
+from .cache import CacheStats
+from .columns import Column
+from .core import BackupProgress, connect, Connection, Cursor
+from .deadline import QueryTimeoutError
+from .executor import SharedExecutor
+from .latency import LatencyHistogram, LatencyStats, OperationTiming
+from .pipeline import Pipeline, PipelineError
+from .pool import create_pool, Pool, PoolStats
+from .sharding import ShardedDatabase
+from .slowlog import SlowQuery
+from .statements import normalize_sql, StatementStats
 
 __all__ = [
     "__version__",
@@ -33,6 +44,24 @@ __all__ = [
     "connect",
     "Connection",
     "Cursor",
+    "Column",
+    "SharedExecutor",
+    "BackupProgress",
+    "BulkInsertResult",
+    "CacheStats",
+    "LatencyHistogram",
+    "LatencyStats",
+    "OperationTiming",
+    "SlowQuery",
+    "StatementStats",
+    "normalize_sql",
+    "Pipeline",
+    "PipelineError",
+    "QueryTimeoutError",
+    "create_pool",
+    "Pool",
+    "PoolStats",
+    "ShardedDatabase",
     "Row",
     "Warning",
     "Error",
@@ -0,0 +1,35 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Benchmarks for aiosqlite, run with ``python -m aiosqlite.bench``
+"""
+
+from .memory import register_memory
+from .runner import (
+    benchmark,
+    BenchResult,
+    Case,
+    compare,
+    dump,
+    load,
+    overhead,
+    Regression,
+    run,
+)
+from .scenarios import LoadScenario, register_load
+
+__all__ = [
+    "benchmark",
+    "BenchResult",
+    "Case",
+    "compare",
+    "dump",
+    "load",
+    "LoadScenario",
+    "overhead",
+    "Regression",
+    "register_load",
+    "register_memory",
+    "run",
+]
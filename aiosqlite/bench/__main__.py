@@ -0,0 +1,197 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Run benchmarks, optionally saving results or comparing them to a baseline.
+
+    python -m aiosqlite.bench --json results.json
+    python -m aiosqlite.bench --compare results.json --threshold 0.1
+    python -m aiosqlite.bench --tasks 200 --reads 0.8 --connections 2
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional
+
+from .runner import (
+    BenchResult,
+    compare,
+    dump,
+    load,
+    METRICS,
+    overhead,
+    Regression,
+    run,
+    select,
+)
+
+from .scenarios import LoadScenario, register_load
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
+
+
+def _format(metric: str, value: float) -> str:
+    if metric.endswith("_bytes"):
+        return _format_bytes(value)
+    return _format_time(value)
+
+
+def _header() -> str:
+    return (
+        f"{'Benchmark':<24} {'Iterations':>10} {'Rate':>11} "
+        f"{'p50':>9} {'p95':>9} {'p99':>9} {'Stdev':>9}"
+    )
+
+
+def _row(result: BenchResult) -> str:
+    return (
+        f"{result.name:<24} {result.iterations:>10} "
+        f"{result.ops_per_second:>9.1f}/s "
+        f"{_format_time(result.p50):>9} {_format_time(result.p95):>9} "
+        f"{_format_time(result.p99):>9} {_format_time(result.stdev):>9}"
+    )
+
+
+def _report(
+    results: list[BenchResult], regressions: list[Regression], metric: str
+) -> None:
+    loads = [result for result in results if "queue_depth" in result.extra]
+    if loads:
+        print(
+            f"\n{'Load':<24} {'Tasks':>6} {'Conns':>6} {'Reads':>6} "
+            f"{'Depth':>6} {'Max':>6}"
+        )
+        for result in loads:
+            extra = result.extra
+            print(
+                f"{result.name:<24} {extra['tasks']:>6} {extra['connections']:>6} "
+                f"{extra['reads']:>6.0%} {extra['queue_depth']['mean']:>6.1f} "
+                f"{extra['queue_depth']['max']:>6}"
+            )
+
+    memory = [result for result in results if "peak_bytes" in result.extra]
+    if memory:
+        print(f"\n{'Memory':<24} {'Rows':>10} {'Peak':>10} {'Steady':>10}")
+        for result in memory:
+            extra = result.extra
+            print(
+                f"{result.name:<24} {extra['rows']:>10} "
+                f"{_format_bytes(extra['peak_bytes']):>10} "
+                f"{_format_bytes(extra['steady_bytes']):>10}"
+            )
+
+    ratios = overhead(results, metric)
+    if ratios:
+        print(f"\n{'Overhead vs sqlite3':<24} {metric:>10}")
+        for name, ratio in ratios.items():
+            print(f"{name:<24} {ratio:>9.2f}x")
+
+    if regressions:
+        print(
+            f"\n{'Regression':<24} {'Metric':>12} {'Baseline':>10} {'Current':>10} "
+            f"{'Change':>8}"
+        )
+        for reg in regressions:
+            print(
+                f"{reg.name:<24} {reg.metric:>12} "
+                f"{_format(reg.metric, reg.baseline):>10} "
+                f"{_format(reg.metric, reg.current):>10} {reg.change:>+7.0%}"
+            )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m aiosqlite.bench", description=__doc__.splitlines()[1]
+    )
+    parser.add_argument(
+        "names", nargs="*", help="only run benchmarks matching these names or groups"
+    )
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    parser.add_argument(
+        "--duration", type=float, default=1.0, help="seconds to run each benchmark"
+    )
+    parser.add_argument(
+        "--warmup", type=float, default=0.1, help="seconds of warmup per benchmark"
+    )
+    parser.add_argument(
+        "--rows", type=int, default=10000, help="rows in the benchmark table"
+    )
+    parser.add_argument(
+        "--tasks", type=int, help="run a custom load scenario with this many tasks"
+    )
+    parser.add_argument(
+        "--reads",
+        type=float,
+        default=0.9,
+        help="fraction of reads in the custom load scenario",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=1,
+        help="connections shared by tasks in the custom load scenario",
+    )
+    parser.add_argument("--json", type=Path, help="save results to this file")
+    parser.add_argument(
+        "--compare", type=Path, help="compare results to a previously saved file"
+    )
+    parser.add_argument(
+        "--metric", choices=METRICS, default="p50", help="metric to compare"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fail if a benchmark is slower than the baseline by this fraction",
+    )
+    args = parser.parse_args(argv)
+
+    if args.tasks:
+        scenario = LoadScenario(args.tasks, args.reads, args.connections)
+        args.names.append(register_load("load_custom", scenario).name)
+
+    if args.list:
+        for case in select(args.names):
+            print(f"{case.name:<24} {case.group}")
+        return 0
+
+    baseline = load(args.compare) if args.compare else None
+
+    print(_header())
+    results = run(
+        args.names,
+        duration=args.duration,
+        warmup=args.warmup,
+        rows=args.rows,
+        progress=lambda result: print(_row(result), flush=True),
+    )
+
+    if args.json:
+        dump(results, args.json)
+
+    regressions = []
+    if baseline is not None:
+        regressions = compare(
+            results, baseline, metric=args.metric, threshold=args.threshold
+        )
+    _report(results, regressions, args.metric)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
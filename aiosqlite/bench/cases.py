@@ -0,0 +1,167 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Benchmark cases for aiosqlite, alongside equivalent cases using sqlite3 directly
+"""
+
+import sqlite3
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import aiosqlite
+from .runner import benchmark
+
+CHUNK_SIZES = (16, 64, 256, 1024)
+BULK_ROWS = 1000
+MANY_ROWS = 100
+
+
+@benchmark("sqlite3_connect", "connect")
+async def sqlite3_connect(path: Path) -> AsyncGenerator[None, None]:
+    while True:
+        yield
+        sqlite3.connect(path).close()
+
+
+@benchmark("connect", "connect", baseline="sqlite3_connect")
+async def connect(path: Path) -> AsyncGenerator[None, None]:
+    while True:
+        yield
+        async with aiosqlite.connect(path):
+            pass
+
+
+@benchmark("connect_shared", "connect", baseline="sqlite3_connect")
+async def connect_shared(path: Path) -> AsyncGenerator[None, None]:
+    with aiosqlite.SharedExecutor(1) as executor:
+        while True:
+            yield
+            async with aiosqlite.connect(path, executor=executor):
+                pass
+
+
+@benchmark("sqlite3_select_one", "select_one")
+async def sqlite3_select_one(path: Path) -> AsyncGenerator[None, None]:
+    conn = sqlite3.connect(path)
+    try:
+        i = 0
+        while True:
+            yield
+            i = (i + 7919) % BULK_ROWS
+            conn.execute("select * from bench where id = ?", [i + 1]).fetchone()
+    finally:
+        conn.close()
+
+
+@benchmark("select_one", "select_one", baseline="sqlite3_select_one")
+async def select_one(path: Path) -> AsyncGenerator[None, None]:
+    async with aiosqlite.connect(path) as db:
+        i = 0
+        while True:
+            yield
+            i = (i + 7919) % BULK_ROWS
+            async with db.execute("select * from bench where id = ?", [i + 1]) as cur:
+                await cur.fetchone()
+
+
+@benchmark("select_one_fetchall", "select_one", baseline="sqlite3_select_one")
+async def select_one_fetchall(path: Path) -> AsyncGenerator[None, None]:
+    async with aiosqlite.connect(path) as db:
+        i = 0
+        while True:
+            yield
+            i = (i + 7919) % BULK_ROWS
+            await db.execute_fetchall("select * from bench where id = ?", [i + 1])
+
+
+@benchmark("sqlite3_select_bulk", "select_bulk")
+async def sqlite3_select_bulk(path: Path) -> AsyncGenerator[None, None]:
+    conn = sqlite3.connect(path)
+    try:
+        while True:
+            yield
+            conn.execute("select * from bench limit ?", [BULK_ROWS]).fetchall()
+    finally:
+        conn.close()
+
+
+@benchmark("select_bulk", "select_bulk", baseline="sqlite3_select_bulk")
+async def select_bulk(path: Path) -> AsyncGenerator[None, None]:
+    async with aiosqlite.connect(path) as db:
+        while True:
+            yield
+            await db.execute_fetchall("select * from bench limit ?", [BULK_ROWS])
+
+
+@benchmark("sqlite3_insert", "insert")
+async def sqlite3_insert(path: Path) -> AsyncGenerator[None, None]:
+    conn = sqlite3.connect(path)
+    try:
+        while True:
+            yield
+            conn.execute("insert into bench (k, v) values (?, ?)", [1, "inserted"])
+            conn.commit()
+    finally:
+        conn.close()
+
+
+@benchmark("insert", "insert", baseline="sqlite3_insert")
+async def insert(path: Path) -> AsyncGenerator[None, None]:
+    async with aiosqlite.connect(path) as db:
+        while True:
+            yield
+            await db.execute("insert into bench (k, v) values (?, ?)", [1, "inserted"])
+            await db.commit()
+
+
+@benchmark("sqlite3_executemany", "executemany")
+async def sqlite3_executemany(path: Path) -> AsyncGenerator[None, None]:
+    conn = sqlite3.connect(path)
+    rows = [(i, "inserted") for i in range(MANY_ROWS)]
+    try:
+        while True:
+            yield
+            conn.executemany("insert into bench (k, v) values (?, ?)", rows)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+@benchmark("executemany", "executemany", baseline="sqlite3_executemany")
+async def executemany(path: Path) -> AsyncGenerator[None, None]:
+    async with aiosqlite.connect(path) as db:
+        rows = [(i, "inserted") for i in range(MANY_ROWS)]
+        while True:
+            yield
+            await db.executemany("insert into bench (k, v) values (?, ?)", rows)
+            await db.commit()
+
+
+@benchmark("sqlite3_iterate", "iterate")
+async def sqlite3_iterate(path: Path) -> AsyncGenerator[None, None]:
+    conn = sqlite3.connect(path)
+    try:
+        while True:
+            yield
+            for _ in conn.execute("select * from bench limit ?", [BULK_ROWS]):
+                pass
+    finally:
+        conn.close()
+
+
+def _iterate(chunk_size: int) -> None:
+    @benchmark(f"iterate_{chunk_size}", "iterate", baseline="sqlite3_iterate")
+    async def iterate(path: Path) -> AsyncGenerator[None, None]:
+        async with aiosqlite.connect(path, iter_chunk_size=chunk_size) as db:
+            while True:
+                yield
+                async with db.execute(
+                    "select * from bench limit ?", [BULK_ROWS]
+                ) as cur:
+                    async for _ in cur:
+                        pass
+
+
+for _chunk_size in CHUNK_SIZES:
+    _iterate(_chunk_size)
@@ -0,0 +1,164 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Memory benchmarks for fetching, iterating, dumping, and backing up large tables
+"""
+
+import gc
+import sqlite3
+import time
+import tracemalloc
+from collections.abc import Awaitable
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import aiosqlite
+from .runner import BenchResult, Case, CASES
+
+__all__ = ["register_memory"]
+
+# the large table has this many times more rows than the benchmark table
+SCALE = 10
+PAYLOAD = "x" * 100
+LARGE_SQL = "select * from bench_large"
+
+Operation = Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+def _idle(conn: sqlite3.Connection) -> None:
+    pass
+
+
+def prepare_large(path: Path) -> int:
+    """Create a wide table with ``SCALE`` rows per row of the benchmark table."""
+    with sqlite3.connect(path) as conn:
+        ((rows,),) = conn.execute("select count(*) from bench").fetchall()
+        rows *= SCALE
+        conn.execute(
+            "create table bench_large "
+            "(id integer primary key, k integer, a text, b text, c real)"
+        )
+        conn.executemany(
+            "insert into bench_large (k, a, b, c) values (?, ?, ?, ?)",
+            ((i, f"{i:08d}{PAYLOAD}", PAYLOAD, i / 3) for i in range(rows)),
+        )
+    conn.close()
+    return rows
+
+
+async def measure_memory(
+    operation: Operation,
+    case: Case,
+    path: Path,
+    duration: float,
+    warmup: float,
+    max_iterations: int,
+) -> BenchResult:
+    """
+    Run an operation repeatedly while tracing Python allocations, on the event
+    loop and connection threads alike, recording the peak memory allocated
+    during each run, and the memory still allocated once it completes.
+
+    Timings are reported too, but are slowed down by tracing. Memory allocated
+    by SQLite itself is not traced.
+    """
+    rows = prepare_large(path)
+    samples: list[float] = []
+    peaks: list[int] = []
+    steady: list[int] = []
+
+    async with aiosqlite.connect(path) as db:
+        if warmup > 0:
+            await operation(db)
+
+        tracemalloc.start()
+        try:
+            stop = time.perf_counter() + duration
+            start = time.perf_counter()
+            while True:
+                gc.collect()
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+
+                before = time.perf_counter()
+                await operation(db)
+                after = time.perf_counter()
+
+                _, peak = tracemalloc.get_traced_memory()
+                # the connection thread may still reference the last result
+                # until it picks up another call
+                await db.run(_idle)
+                gc.collect()
+                current, _ = tracemalloc.get_traced_memory()
+
+                samples.append(after - before)
+                peaks.append(peak - base)
+                steady.append(current - base)
+                if after >= stop or len(samples) >= max_iterations:
+                    break
+            elapsed = time.perf_counter() - start
+        finally:
+            tracemalloc.stop()
+
+    extra = {
+        "rows": rows,
+        "peak_bytes": max(peaks),
+        "steady_bytes": max(steady),
+    }
+    return BenchResult.from_samples(case, samples, elapsed, extra)
+
+
+def register_memory(name: str, operation: Operation) -> Case:
+    """Register an operation on the large table as a ``memory`` benchmark."""
+    if name in CASES:
+        raise ValueError(f"duplicate benchmark {name!r}")
+    case = CASES[name] = Case(
+        name, None, "memory", measure=partial(measure_memory, operation)
+    )
+    return case
+
+
+async def fetchall(db: aiosqlite.Connection) -> None:
+    async with db.execute(LARGE_SQL) as cursor:
+        await cursor.fetchall()
+
+
+async def fetchmany(db: aiosqlite.Connection) -> None:
+    async with db.execute(LARGE_SQL) as cursor:
+        while await cursor.fetchmany(1000):
+            pass
+
+
+async def execute_fetchall(db: aiosqlite.Connection) -> None:
+    await db.execute_fetchall(LARGE_SQL)
+
+
+async def iterate(chunk_size: int, db: aiosqlite.Connection) -> None:
+    async with db.execute(LARGE_SQL) as cursor:
+        cursor.iter_chunk_size = chunk_size
+        async for _ in cursor:
+            pass
+
+
+async def iterdump(db: aiosqlite.Connection) -> None:
+    async for _ in db.iterdump():
+        pass
+
+
+async def backup(db: aiosqlite.Connection) -> None:
+    target = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        await db.backup(target)
+    finally:
+        target.close()
+
+
+register_memory("memory_fetchall", fetchall)
+register_memory("memory_fetchmany", fetchmany)
+register_memory("memory_execute_fetchall", execute_fetchall)
+for _chunk_size in (64, 1024, 16384):
+    register_memory(f"memory_iterate_{_chunk_size}", partial(iterate, _chunk_size))
+register_memory("memory_iterdump", iterdump)
+register_memory("memory_backup", backup)
@@ -0,0 +1,301 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Measure benchmark cases, and compare results against a saved baseline
+"""
+
+import asyncio
+import json
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections.abc import AsyncGenerator, Coroutine
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from ..__version__ import __version__
+
+__all__ = [
+    "benchmark",
+    "BenchResult",
+    "Case",
+    "compare",
+    "dump",
+    "load",
+    "overhead",
+    "Regression",
+    "run",
+]
+
+METRICS = ("p50", "p95", "p99", "mean")
+
+# recorded by memory benchmarks, and always compared when present
+MEMORY_METRICS = ("peak_bytes", "steady_bytes")
+
+CaseFunction = Callable[[Path], AsyncGenerator[None, None]]
+MeasureFunction = Callable[
+    ["Case", Path, float, float, int], Coroutine[Any, Any, "BenchResult"]
+]
+
+
+@dataclass
+class Case:
+    """
+    A registered benchmark.
+
+    ``fn`` is an async generator function that is given the path of a freshly
+    prepared database. It should do any setup, then yield once before running
+    the operation being measured, and yield again after each operation. Cases
+    with a ``baseline`` are compared against that case, normally one using the
+    standard :mod:`sqlite3` module directly, to report the overhead of aiosqlite.
+
+    Cases that need more control over timing, like load scenarios, provide their
+    own ``measure`` function instead.
+    """
+
+    name: str
+    fn: Optional[CaseFunction]
+    group: str
+    baseline: Optional[str] = None
+    measure: Optional[MeasureFunction] = None
+
+
+@dataclass
+class BenchResult:
+    """Latency distribution of a single benchmark, in seconds per operation."""
+
+    name: str
+    group: str
+    iterations: int
+    duration: float
+    mean: float
+    stdev: float
+    min: float
+    max: float
+    p50: float
+    p95: float
+    p99: float
+    baseline: Optional[str] = None
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.iterations / self.duration if self.duration > 0 else 0.0
+
+    @classmethod
+    def from_samples(
+        cls,
+        case: Case,
+        samples: list[float],
+        duration: float,
+        extra: Optional[dict[str, Any]] = None,
+    ) -> "BenchResult":
+        ordered = sorted(samples)
+        return cls(
+            name=case.name,
+            group=case.group,
+            iterations=len(ordered),
+            duration=duration,
+            mean=statistics.fmean(ordered),
+            stdev=statistics.pstdev(ordered),
+            min=ordered[0],
+            max=ordered[-1],
+            p50=percentile(ordered, 50),
+            p95=percentile(ordered, 95),
+            p99=percentile(ordered, 99),
+            baseline=case.baseline,
+            extra=extra or {},
+        )
+
+
+@dataclass
+class Regression:
+    """A benchmark whose metric grew by more than the allowed threshold."""
+
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else 0.0
+
+
+CASES: dict[str, Case] = {}
+
+
+def benchmark(
+    name: str, group: str, baseline: Optional[str] = None
+) -> Callable[[CaseFunction], CaseFunction]:
+    """Register an async generator function as a benchmark case."""
+
+    def wrapper(fn: CaseFunction) -> CaseFunction:
+        if name in CASES:
+            raise ValueError(f"duplicate benchmark {name!r}")
+        CASES[name] = Case(name, fn, group, baseline)
+        return fn
+
+    return wrapper
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list of samples."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def prepare(path: Path, rows: int = 10000) -> None:
+    """Create the table read by benchmark cases, with the given number of rows."""
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "create table bench (id integer primary key, k integer, v text not null)"
+        )
+        conn.executemany(
+            "insert into bench (k, v) values (?, ?)",
+            ((i, f"value {i:08d}") for i in range(rows)),
+        )
+    conn.close()
+
+
+async def measure(
+    case: Case, path: Path, duration: float, warmup: float, max_iterations: int
+) -> BenchResult:
+    """Run a case repeatedly for the given duration, timing every operation."""
+    assert case.fn is not None
+    gen = case.fn(path)
+    await gen.asend(None)
+    samples: list[float] = []
+    try:
+        warm_until = time.perf_counter() + warmup
+        while time.perf_counter() < warm_until:
+            await gen.asend(None)
+
+        start = time.perf_counter()
+        stop = start + duration
+        while True:
+            before = time.perf_counter()
+            await gen.asend(None)
+            after = time.perf_counter()
+            samples.append(after - before)
+            if after >= stop or len(samples) >= max_iterations:
+                break
+    finally:
+        await gen.aclose()
+
+    return BenchResult.from_samples(case, samples, time.perf_counter() - start)
+
+
+def select(names: Optional[list[str]] = None) -> list[Case]:
+    """Return registered cases whose name or group contains any given pattern."""
+    from . import cases, memory, scenarios  # noqa: F401 register cases
+
+    if not names:
+        return list(CASES.values())
+    return [
+        case
+        for case in CASES.values()
+        if any(name in case.name or name == case.group for name in names)
+    ]
+
+
+def run(
+    names: Optional[list[str]] = None,
+    *,
+    duration: float = 1.0,
+    warmup: float = 0.1,
+    max_iterations: int = 1_000_000,
+    rows: int = 10000,
+    progress: Optional[Callable[[BenchResult], None]] = None,
+) -> list[BenchResult]:
+    """
+    Run the selected benchmark cases, each against a freshly prepared database,
+    and each within its own event loop.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as td:
+        for index, case in enumerate(select(names)):
+            path = Path(td) / f"bench-{index}.db"
+            prepare(path, rows)
+            measure_case = case.measure or measure
+            result = asyncio.run(
+                measure_case(case, path, duration, warmup, max_iterations)
+            )
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return results
+
+
+def environment() -> dict[str, str]:
+    return {
+        "aiosqlite": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def dump(results: list[BenchResult], path: Path) -> None:
+    """Write results, and details of the environment they ran in, as JSON."""
+    data = {
+        "environment": environment(),
+        "results": {result.name: asdict(result) for result in results},
+    }
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def load(path: Path) -> dict[str, BenchResult]:
+    """Read results previously written by :func:`dump`."""
+    data = json.loads(path.read_text())
+    return {name: BenchResult(**value) for name, value in data["results"].items()}
+
+
+def compare(
+    results: list[BenchResult],
+    baseline: dict[str, BenchResult],
+    *,
+    metric: str = "p50",
+    threshold: float = 0.1,
+) -> list[Regression]:
+    """
+    Return every result whose metric is more than ``threshold`` (a fraction)
+    slower than the same benchmark in the baseline, or whose memory usage grew
+    by more than ``threshold``. Benchmarks missing from the baseline are ignored.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        pairs = [(metric, getattr(previous, metric), getattr(result, metric))]
+        for name in MEMORY_METRICS:
+            if name in previous.extra and name in result.extra:
+                pairs.append((name, previous.extra[name], result.extra[name]))
+        for name, before, after in pairs:
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(Regression(result.name, name, before, after))
+    return regressions
+
+
+def overhead(results: list[BenchResult], metric: str = "p50") -> dict[str, float]:
+    """Return the ratio of each result's metric to that of its baseline case."""
+    by_name = {result.name: result for result in results}
+    ratios = {}
+    for result in results:
+        if result.baseline is None or result.baseline not in by_name:
+            continue
+        base = getattr(by_name[result.baseline], metric)
+        if base > 0:
+            ratios[result.name] = getattr(result, metric) / base
+    return ratios
@@ -0,0 +1,137 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Load scenarios, with many concurrent tasks sharing one or more connections
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+import aiosqlite
+from .runner import BenchResult, Case, CASES
+
+__all__ = ["LoadScenario", "register_load"]
+
+READ_SQL = "select * from bench where id = ?"
+WRITE_SQL = "update bench set k = k + 1 where id = ?"
+
+# number of queue depth samples taken over the course of a scenario
+DEPTH_SAMPLES = 50
+
+
+@dataclass
+class LoadScenario:
+    """
+    Concurrent tasks running a mix of single-row reads and writes.
+
+    ``reads`` is the fraction of operations that are reads. With more than one
+    connection, the database uses WAL mode, and tasks are spread evenly across
+    connections.
+    """
+
+    tasks: int
+    reads: float = 0.9
+    connections: int = 1
+
+
+def _queue_depth(db: aiosqlite.Connection) -> int:
+    stats = db.latency_stats()
+    return stats.queue_depth if stats is not None else 0
+
+
+async def measure_load(
+    scenario: LoadScenario,
+    case: Case,
+    path: Path,
+    duration: float,
+    warmup: float,
+    max_iterations: int,
+) -> BenchResult:
+    """
+    Run every task in a scenario for the given duration, timing each operation,
+    and sampling the total queue depth of all connections at regular intervals.
+    """
+    dbs = []
+    for _ in range(scenario.connections):
+        dbs.append(
+            await aiosqlite.connect(path, isolation_level=None, record_latency=True)
+        )
+    try:
+        if scenario.connections > 1:
+            await dbs[0].execute("pragma journal_mode = wal")
+        ((max_id,),) = await dbs[0].execute_fetchall("select max(id) from bench")
+
+        samples: list[float] = []
+        depths: list[int] = []
+        recording = False
+        stopping = False
+
+        async def client(index: int) -> None:
+            db = dbs[index % len(dbs)]
+            rng = random.Random(index)
+            while not stopping:
+                key = rng.randint(1, max_id)
+                before = time.perf_counter()
+                if rng.random() < scenario.reads:
+                    await db.execute_fetchall(READ_SQL, [key])
+                else:
+                    await db.execute(WRITE_SQL, [key])
+                if recording and len(samples) < max_iterations:
+                    samples.append(time.perf_counter() - before)
+
+        async def sampler() -> None:
+            while not stopping:
+                if recording:
+                    depths.append(sum(_queue_depth(db) for db in dbs))
+                await asyncio.sleep(duration / DEPTH_SAMPLES)
+
+        tasks = [asyncio.ensure_future(client(i)) for i in range(scenario.tasks)]
+        tasks.append(asyncio.ensure_future(sampler()))
+        try:
+            await asyncio.sleep(warmup)
+            recording = True
+            start = time.perf_counter()
+            await asyncio.sleep(duration)
+            recording = False
+            elapsed = time.perf_counter() - start
+        finally:
+            stopping = True
+            await asyncio.gather(*tasks)
+
+    finally:
+        for db in dbs:
+            await db.close()
+
+    if not samples:
+        raise RuntimeError(f"no operations completed in {case.name}")
+
+    extra = {
+        **asdict(scenario),
+        "queue_depth": {
+            "max": max(depths, default=0),
+            "mean": sum(depths) / len(depths) if depths else 0.0,
+            "samples": depths,
+        },
+    }
+    return BenchResult.from_samples(case, samples, elapsed, extra)
+
+
+def register_load(name: str, scenario: LoadScenario) -> Case:
+    """Register a load scenario as a benchmark case in the ``load`` group."""
+    if name in CASES:
+        raise ValueError(f"duplicate benchmark {name!r}")
+    case = CASES[name] = Case(
+        name, None, "load", measure=partial(measure_load, scenario)
+    )
+    return case
+
+
+for _tasks in (1, 16, 128):
+    register_load(f"load_{_tasks}_tasks", LoadScenario(_tasks))
+register_load("load_128_tasks_writes", LoadScenario(128, reads=0.5))
+register_load("load_128_tasks_4_conns", LoadScenario(128, connections=4))
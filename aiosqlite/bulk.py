@@ -0,0 +1,194 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Bulk loading of rows with multi-row inserts
+"""
+
+import sqlite3
+import sys
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Any
+
+from .columns import quote_identifier
+
+__all__ = ["BulkInsertResult"]
+
+# default value of SQLITE_MAX_VARIABLE_NUMBER before SQLite 3.32
+_DEFAULT_MAX_VARIABLES = 999
+
+# applied for the duration of a load with `fast=True`
+_FAST_PRAGMAS = {"synchronous": 0, "cache_size": -65536}
+
+
+@dataclass
+class BulkInsertResult:
+    """Summary of a completed bulk insert."""
+
+    rows: int
+    elapsed: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _max_variables(conn: sqlite3.Connection) -> int:
+    if sys.version_info >= (3, 11):
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    return _DEFAULT_MAX_VARIABLES
+
+
+def _secondary_indexes(conn: sqlite3.Connection, table: str) -> list[tuple[str, str]]:
+    # only plain indexes created with CREATE INDEX: unique indexes enforce
+    # constraints, and must stay in place while rows are loaded
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    names = [
+        name
+        for _, name, unique, origin, *_ in cursor.execute(
+            f"PRAGMA index_list({quote_identifier(table)})"
+        ).fetchall()
+        if not unique and origin == "c"
+    ]
+    indexes = []
+    for name in names:
+        (sql,) = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", [name]
+        ).fetchone()
+        indexes.append((name, sql))
+    cursor.close()
+    return indexes
+
+
+class BulkLoader:
+    """
+    Insert rows using as many rows per statement as SQLite allows variables,
+    one batch of ``commit_every`` rows at a time.
+
+    The whole load runs as one call on the connection thread, so that no other
+    call can open or end a transaction between batches. Each batch is loaded
+    within a savepoint: outside of a transaction, releasing it commits the
+    batch, while inside one, the batch becomes part of that transaction, without
+    committing it.
+
+    :meta private:
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        rows: Iterable[Sequence[Any]],
+        columns: Sequence[str],
+        commit_every: int,
+        fast: bool,
+        defer_indexes: bool,
+    ) -> None:
+        if not columns:
+            raise ValueError("no columns to insert")
+        if commit_every < 1:
+            raise ValueError("commit_every must be at least one row")
+
+        self.conn = conn
+        self.table = table
+        self.source = iter(rows)
+        self.width = len(columns)
+        self.commit_every = commit_every
+        self.fast = fast
+        self.defer_indexes = defer_indexes
+
+        self.prefix = "INSERT INTO {} ({}) VALUES ".format(
+            quote_identifier(table), ", ".join(quote_identifier(c) for c in columns)
+        )
+        self.row_sql = "(" + ", ".join("?" * self.width) + ")"
+        self.statements: dict[int, str] = {}
+        self.per_statement = 1
+
+        self.pragmas: dict[str, Any] = {}
+        self.indexes: list[tuple[str, str]] = []
+        self.rows = 0
+        self.before = time.monotonic()
+
+    def statement(self, count: int) -> str:
+        if count not in self.statements:
+            self.statements[count] = self.prefix + ", ".join([self.row_sql] * count)
+        return self.statements[count]
+
+    def start(self) -> None:
+        """Apply fast pragmas and drop deferred indexes, remembering each change."""
+        conn = self.conn
+        self.per_statement = max(1, _max_variables(conn) // self.width)
+        self.before = time.monotonic()
+
+        if self.fast:
+            for pragma, value in _FAST_PRAGMAS.items():
+                (self.pragmas[pragma],) = conn.execute(f"PRAGMA {pragma}").fetchone()
+                conn.execute(f"PRAGMA {pragma} = {value}")
+
+        if self.defer_indexes:
+            for name, sql in _secondary_indexes(conn, self.table):
+                conn.execute(f"DROP INDEX {quote_identifier(name)}")
+                self.indexes.append((name, sql))
+
+    def load_batch(self) -> bool:
+        """
+        Load the next batch of rows, rolling it back if any row fails.
+        Returns True once every row has been loaded.
+        """
+        conn = self.conn
+        try:
+            conn.execute("SAVEPOINT bulk_insert")
+            loaded = 0
+            while loaded < self.commit_every:
+                size = min(self.per_statement, self.commit_every - loaded)
+                batch = list(islice(self.source, size))
+                if not batch:
+                    break
+                for row in batch:
+                    if len(row) != self.width:
+                        raise ValueError(f"expected {self.width} values, got {row!r}")
+                conn.execute(
+                    self.statement(len(batch)), list(chain.from_iterable(batch))
+                )
+                loaded += len(batch)
+            conn.execute("RELEASE bulk_insert")
+        except BaseException:
+            # a cancelled or timed out load must not abort its own rollback; the
+            # connection reinstates its progress handler once the call returns
+            conn.set_progress_handler(None, 0)
+            try:
+                conn.execute("ROLLBACK TO bulk_insert")
+                conn.execute("RELEASE bulk_insert")
+            except sqlite3.OperationalError:
+                # aborting SAVEPOINT may or may not have opened it, and aborting
+                # an insert may have rolled back the whole transaction
+                pass
+            raise
+
+        self.rows += loaded
+        return loaded < self.commit_every
+
+    def finish(self) -> None:
+        """Rebuild deferred indexes and restore pragmas, even after a failure."""
+        indexes, self.indexes = self.indexes, []
+        pragmas, self.pragmas = self.pragmas, {}
+        # as with rolling back a batch, cleanup must not be aborted
+        self.conn.set_progress_handler(None, 0)
+        for _, sql in indexes:
+            self.conn.execute(sql)
+        for pragma, value in pragmas.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+
+    def run(self) -> BulkInsertResult:
+        """Load every row, restoring indexes and pragmas even if the load fails."""
+        try:
+            self.start()
+            while not self.load_batch():
+                pass
+        finally:
+            self.finish()
+        return BulkInsertResult(rows=self.rows, elapsed=time.monotonic() - self.before)
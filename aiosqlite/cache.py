@@ -0,0 +1,217 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Query result cache with table-based invalidation
+"""
+
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from itertools import count
+from threading import Lock
+from typing import Any, Callable, Optional
+
+__all__ = ["CacheStats"]
+
+# upper bound on the number of statements whose tables are remembered
+_MAX_STATEMENTS = 1024
+
+_WRITE_ACTIONS = frozenset(
+    {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+)
+
+# schema changes that may change the results of any query, or the tables that
+# other statements read and write
+_SCHEMA_ACTIONS = frozenset(
+    {
+        sqlite3.SQLITE_CREATE_TABLE,
+        sqlite3.SQLITE_CREATE_TEMP_TABLE,
+        sqlite3.SQLITE_CREATE_TEMP_TRIGGER,
+        sqlite3.SQLITE_CREATE_TEMP_VIEW,
+        sqlite3.SQLITE_CREATE_TRIGGER,
+        sqlite3.SQLITE_CREATE_VIEW,
+        sqlite3.SQLITE_CREATE_VTABLE,
+        sqlite3.SQLITE_DROP_TABLE,
+        sqlite3.SQLITE_DROP_TEMP_TABLE,
+        sqlite3.SQLITE_DROP_TEMP_TRIGGER,
+        sqlite3.SQLITE_DROP_TEMP_VIEW,
+        sqlite3.SQLITE_DROP_TRIGGER,
+        sqlite3.SQLITE_DROP_VIEW,
+        sqlite3.SQLITE_DROP_VTABLE,
+        sqlite3.SQLITE_ALTER_TABLE,
+    }
+)
+
+# statements whose results may be cached, if they don't write to any table
+_CACHEABLE_KEYWORDS = frozenset({"SELECT", "VALUES", "WITH"})
+_FIRST_KEYWORD = re.compile(r"^[\s(]*(\w+)")
+
+Tables = frozenset[str]
+
+
+def is_cacheable_statement(sql: str) -> bool:
+    """
+    Whether results of the given statement may be cached: only queries are,
+    while PRAGMA and other statements, which may have side effects, are not.
+    Queries that also write, like ``WITH ... INSERT``, are caught when preparing.
+    """
+    match = _FIRST_KEYWORD.match(sql)
+    return match is not None and match.group(1).upper() in _CACHEABLE_KEYWORDS
+
+
+@dataclass
+class CacheStats:
+    """Counters for a connection's query result cache."""
+
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class ResultCache:
+    """
+    LRU cache of query results, with optional expiry, and invalidation of any
+    results that read from a table whenever a statement writes to that table.
+    Statements that change the schema invalidate every result.
+
+    Results are stored and invalidated from the connection thread, and looked up
+    from the event loop, so all access to entries is guarded by a lock.
+
+    :meta private:
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float]) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._lock = Lock()
+        self._entries: OrderedDict[Hashable, tuple[list[Any], float, Tables]] = (
+            OrderedDict()
+        )
+        self._statements: OrderedDict[str, tuple[Tables, Optional[Tables]]] = (
+            OrderedDict()
+        )
+        self._unique = count()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[list[Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, key: Hashable, rows: list[Any], tables: Tables) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            self._entries[key] = (rows, expires, tables)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, tables: Optional[Iterable[str]]) -> None:
+        """
+        Drop results that read any of the given tables, or all if ``None``,
+        along with the tables remembered for each statement, which a schema
+        change may also have changed.
+        """
+        with self._lock:
+            if tables is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._statements.clear()
+                return
+
+            changed = set(tables)
+            if not changed:
+                return
+            stale = [
+                k for k, e in self._entries.items() if not changed.isdisjoint(e[2])
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def statement_tables(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        restore_authorizer: Callable[[], None],
+    ) -> tuple[Tables, Optional[Tables]]:
+        """
+        Find the tables a statement reads from and writes to, with ``None`` for
+        the latter if the statement changes the schema. Must be called before
+        running the statement, which may drop or create the tables it names.
+
+        SQLite only consults the authorizer when preparing a statement, and the
+        sqlite3 module reuses prepared statements, so the tables are captured by
+        preparing a uniquely-commented ``EXPLAIN`` of the statement instead, and
+        remembered for subsequent calls. Must run on the connection thread.
+        """
+        if sql in self._statements:
+            self._statements.move_to_end(sql)
+            return self._statements[sql]
+
+        reads: set[str] = set()
+        writes: set[str] = set()
+        schema = False
+
+        def authorizer(
+            action: int, arg1: Optional[str], arg2: Optional[str], *_: Any
+        ) -> int:
+            nonlocal schema
+            if action == sqlite3.SQLITE_READ and arg1:
+                reads.add(arg1.lower())
+            elif action in _WRITE_ACTIONS and arg1:
+                writes.add(arg1.lower())
+            elif action in _SCHEMA_ACTIONS:
+                schema = True
+            return sqlite3.SQLITE_OK
+
+        conn.set_authorizer(authorizer)
+        try:
+            conn.execute(f"EXPLAIN {sql}\n/* {next(self._unique)} */").close()
+        except sqlite3.Error:
+            # parameters aren't bound, and invalid statements will fail on their
+            # own, but the statement has still been prepared by this point
+            pass
+        finally:
+            restore_authorizer()
+
+        tables = (frozenset(reads), None if schema else frozenset(writes))
+        self._statements[sql] = tables
+        while len(self._statements) > _MAX_STATEMENTS:
+            self._statements.popitem(last=False)
+        return tables
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+            )
@@ -0,0 +1,175 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Columnar conversion of query results
+"""
+
+import sqlite3
+from array import array
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any, NamedTuple, Optional, Union
+
+__all__ = ["Column"]
+
+
+class Column(NamedTuple):
+    """
+    Values of a single result column.
+
+    Integer and real columns are stored in an ``array.array`` (typecode ``q`` or
+    ``d`` unless given explicitly), or a NumPy array if requested. Any other
+    column falls back to a list of values. ``mask`` is ``None`` if the column
+    has no NULL values; otherwise it marks the rows that were NULL, whose value
+    is stored as zero in numeric columns.
+    """
+
+    values: Any
+    mask: Optional[Any]
+
+
+class _ColumnBuilder:
+    __slots__ = ("fixed", "values", "mask")
+
+    def __init__(self, typecode: Optional[str]) -> None:
+        # without an explicit typecode, start as an integer column, and promote
+        # to real or generic columns as values require
+        self.fixed = typecode is not None
+        self.values: Union[array, list[Any]] = array(typecode or "q")
+        self.mask: Optional[bytearray] = None
+
+    def append(self, value: Any, row: int) -> None:
+        values = self.values
+        if value is None:
+            if self.mask is None:
+                self.mask = bytearray(row)
+            self.mask.append(1)
+            values.append(0 if isinstance(values, array) else None)
+            return
+
+        if self.mask is not None:
+            self.mask.append(0)
+
+        if isinstance(values, array) and not self.fixed:
+            if isinstance(value, float) and values.typecode == "q":
+                values = self.values = array("d", values)
+            elif not isinstance(value, (int, float)):
+                values = self.values = list(values)
+                if self.mask is not None:
+                    for index, null in enumerate(self.mask):
+                        if null:
+                            values[index] = None
+
+        values.append(value)
+
+    def build(self, numpy: bool) -> Column:
+        values: Any = self.values
+        mask: Any = self.mask
+        if numpy:
+            import numpy as np
+
+            if isinstance(values, array):
+                # numpy shares the C type codes used by the array module
+                values = np.frombuffer(values, dtype=values.typecode)
+            else:
+                values = np.array(values, dtype=object)
+            if mask is not None:
+                mask = np.frombuffer(mask, dtype=bool)
+        return Column(values, mask)
+
+
+def fetch_columns(
+    cursor: sqlite3.Cursor,
+    types: Optional[dict[str, str]] = None,
+    numpy: bool = False,
+) -> dict[str, Column]:
+    """
+    Consume the remaining rows of a cursor into columns, keyed by column name.
+
+    Runs on the connection thread, so that rows are converted as they are stepped
+    rather than materialized as a list of rows first.
+
+    :meta private:
+    """
+    if cursor.description is None:
+        return {}
+
+    types = types or {}
+    names = [d[0] for d in cursor.description]
+    builders = [_ColumnBuilder(types.get(name)) for name in names]
+
+    row_factory, cursor.row_factory = cursor.row_factory, None
+    try:
+        for index, row in enumerate(cursor):
+            for column, value in enumerate(row):
+                builders[column].append(value, index)
+    finally:
+        cursor.row_factory = row_factory
+
+    return {name: builders[column].build(numpy) for column, name in enumerate(names)}
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for use in generated SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def column_values(values: Any) -> tuple[int, Iterable[Any]]:
+    """
+    Return the length of a column, and an iterable of its values as Python objects.
+
+    Buffers (``array.array``, NumPy arrays, etc) are read through a memoryview,
+    so that values come out as native ints and floats that sqlite3 can bind.
+    A :class:`Column` is expanded with ``None`` wherever its mask is set.
+
+    :meta private:
+    """
+    if isinstance(values, Column):
+        length, items = column_values(values.values)
+        mask = values.mask
+        if mask is None:
+            return length, items
+        if len(mask) != length:
+            raise ValueError("column mask does not match length of values")
+        return length, (
+            None if mask[index] else item for index, item in enumerate(items)
+        )
+
+    if not isinstance(values, (str, bytes, bytearray, list, tuple)):
+        try:
+            view = memoryview(values)
+        except TypeError:
+            pass
+        else:
+            if view.ndim != 1:
+                raise ValueError("column buffers must be one-dimensional")
+            return len(view), view
+
+    if not isinstance(values, Sequence) or isinstance(values, (str, bytes, bytearray)):
+        raise TypeError(f"expected a buffer or sequence of values, got {values!r}")
+    return len(values), values
+
+
+def insert_rows(table: str, columns: Mapping[str, Any]) -> tuple[str, Iterable]:
+    """
+    Build an insert statement for the given columns, and an iterable of rows
+    that zips the column values together as they are consumed.
+
+    :meta private:
+    """
+    if not columns:
+        raise ValueError("no columns to insert")
+
+    lengths = set()
+    iterables = []
+    for values in columns.values():
+        length, items = column_values(values)
+        lengths.add(length)
+        iterables.append(items)
+    if len(lengths) > 1:
+        raise ValueError("columns must all have the same length")
+
+    names = ", ".join(quote_identifier(name) for name in columns)
+    params = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {quote_identifier(table)} ({names}) VALUES ({params})"
+    return sql, zip(*iterables)  # noqa: B905 lengths already checked
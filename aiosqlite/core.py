@@ -8,18 +8,48 @@ Core implementation of aiosqlite proxies
 import asyncio
 import logging
 import sqlite3
-from collections.abc import AsyncIterator, Generator, Iterable
+import sys
+import time
+from collections import deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Generator,
+    Hashable,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from contextlib import suppress
+from dataclasses import dataclass
 from functools import partial
+from itertools import islice
 from pathlib import Path
-from queue import Empty, Queue, SimpleQueue
-from threading import Thread
-from typing import Any, Callable, Literal, Optional, Union
+from queue import SimpleQueue
+from threading import Condition, local, Lock, Thread
+from typing import Any, Callable, Literal, Optional, TypeVar, Union
 from warnings import warn
 
+from .bulk import BulkInsertResult, BulkLoader
+from .cache import CacheStats, is_cacheable_statement, ResultCache
+from .columns import Column, fetch_columns, insert_rows
 from .context import contextmanager
 from .cursor import Cursor
-
-__all__ = ["connect", "Connection", "Cursor"]
+from .deadline import (
+    cancel_handler,
+    CancelFlag,
+    chain_steps,
+    deadline_handler,
+    QueryTimeoutError,
+)
+from .executor import SharedExecutor
+from .latency import _Timed, LatencyRecorder, LatencyStats, OperationTiming
+from .pipeline import Pipeline
+from .profiles import apply_pragmas, pragma_settings, PragmaValue, Profile
+from .slowlog import result_rows, SlowQuery, SlowQueryLog
+from .statements import StatementRegistry, StatementStats
+
+__all__ = ["BackupProgress", "BulkInsertResult", "connect", "Connection", "Cursor"]
 
 AuthorizerCallback = Callable[[int, str, str, str, str], int]
 
@@ -27,6 +57,9 @@ LOG = logging.getLogger("aiosqlite")
 
 
 IsolationLevel = Optional[Literal["DEFERRED", "IMMEDIATE", "EXCLUSIVE"]]
+Priority = Literal["interactive", "normal", "bulk"]
+
+_T = TypeVar("_T")
 
 
 def set_result(fut: asyncio.Future, result: Any) -> None:
@@ -42,37 +75,386 @@ def set_exception(fut: asyncio.Future, e: BaseException) -> None:
 
 
 _STOP_RUNNING_SENTINEL = object()
-_TxQueue = SimpleQueue[tuple[Optional[asyncio.Future], Callable[[], Any]]]
+_TxItem = tuple[Optional[asyncio.Future], Callable[[], Any], int]
+_TxQueue = SimpleQueue[_TxItem]
+_Opened = tuple[sqlite3.Connection, dict[str, Any]]
 
+# lanes of the connection queue, from highest to lowest priority; closing the
+# connection waits for every other lane to empty
+_LANES: dict[str, int] = {"interactive": 0, "normal": 1, "bulk": 2, "closing": 3}
+_CLOSING = _LANES["closing"]
 
-def _connection_worker_thread(tx: _TxQueue):
+# a call waiting in a lower lane is passed over at most this many times
+STARVATION_LIMIT = 8
+
+# seconds that completed results are held, to resolve them in batches, before
+# the event loop is woken to resolve them, even if later calls are still running
+RESULT_DELAY = 0.002
+_Outcome = tuple[asyncio.Future, Callable[[asyncio.Future, Any], None], Any]
+
+_worker_local = local()
+
+
+def _authorize_all(*args: Any) -> int:
+    return sqlite3.SQLITE_OK
+
+
+def _cache_params(parameters: Any) -> Hashable:
+    if isinstance(parameters, dict):
+        return tuple(sorted(parameters.items()))
+    return tuple(parameters)
+
+
+def _open(
+    connector: Callable[[], sqlite3.Connection],
+    pragmas: Mapping[str, PragmaValue],
+) -> _Opened:
+    """Connect, then apply any pragmas and read back their effective values."""
+    conn = connector()
+    if not pragmas:
+        return conn, {}
+    try:
+        return conn, apply_pragmas(conn, pragmas)
+    except BaseException:
+        conn.close()
+        raise
+
+
+class _Inbox:
+    """
+    Results held for one event loop, to be resolved together by a single
+    threadsafe callback, rather than waking the loop once per result.
     """
-    Execute function calls on a separate thread.
 
-    :meta private:
+    __slots__ = ("loop", "lock", "outcomes", "scheduled", "since")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.lock = Lock()
+        self.outcomes: list[_Outcome] = []
+        self.scheduled = False
+        self.since = 0.0
+
+    def add(self, outcome: _Outcome) -> None:
+        with self.lock:
+            if not self.outcomes:
+                self.since = time.monotonic()
+            self.outcomes.append(outcome)
+
+    def flush(self) -> None:
+        """Schedule held results to be resolved, unless already scheduled."""
+        with self.lock:
+            if not self.outcomes or self.scheduled:
+                return
+            self.scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self.deliver)
+        except RuntimeError:
+            LOG.debug("event loop closed before results could be delivered")
+            with self.lock:
+                self.outcomes.clear()
+                self.scheduled = False
+
+    def deliver(self) -> None:
+        """Resolve held futures, in order, from within their event loop."""
+        with self.lock:
+            outcomes, self.outcomes = self.outcomes, []
+            self.scheduled = False
+        for future, resolve, value in outcomes:
+            resolve(future, value)
+
+
+class _Flusher:
     """
-    while True:
-        # Continues running until all queue items are processed,
-        # even after connection is closed (so we can finalize all
-        # futures)
+    Background thread that flushes results held longer than ``RESULT_DELAY``
+    while the connection thread holding them is busy with a long call. It checks
+    watched inboxes every ``RESULT_DELAY`` while any are holding results, and
+    waits to be notified otherwise, so it only wakes while connections are busy.
+    """
+
+    def __init__(self) -> None:
+        self.cond = Condition()
+        self.inboxes: set[_Inbox] = set()
+        self.thread: Optional[Thread] = None
+        self.idle = True
+
+    def watch(self, inbox: _Inbox) -> None:
+        with self.cond:
+            self.inboxes.add(inbox)
+            if self.thread is None:
+                self.thread = Thread(
+                    target=self.run, name="aiosqlite-flusher", daemon=True
+                )
+                self.thread.start()
+            elif self.idle:
+                self.cond.notify()
+
+    def run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.inboxes:
+                    self.idle = True
+                    self.cond.wait()
+                self.idle = False
+                self.cond.wait(RESULT_DELAY)
+                inboxes = list(self.inboxes)
+
+            now = time.monotonic()
+            for inbox in inboxes:
+                if not inbox.outcomes or inbox.scheduled:
+                    with self.cond:
+                        self.inboxes.discard(inbox)
+                elif now - inbox.since >= RESULT_DELAY:
+                    inbox.flush()
+
+
+_flusher = _Flusher()
 
-        future, function = tx.get()
 
+class _PendingCalls:
+    """
+    Calls taken from a connection's queue, waiting to run, in one FIFO lane per
+    priority. The oldest call in the highest priority lane runs next, unless a
+    call in a lower lane has already been passed over ``STARVATION_LIMIT`` times.
+    """
+
+    def __init__(self, tx: _TxQueue) -> None:
+        self.tx = tx
+        self.lanes: tuple[deque[_TxItem], ...] = tuple(deque() for _ in _LANES)
+        self.passed = [0] * len(_LANES)
+        self.count = 0
+        self.inboxes: dict[asyncio.AbstractEventLoop, _Inbox] = {}
+
+    def __bool__(self) -> bool:
+        return self.count > 0
+
+    def drain(self) -> None:
+        """Move every call in the queue to its lane, without blocking."""
+        tx, lanes = self.tx, self.lanes
+        while not tx.empty():
+            item = tx.get_nowait()
+            lanes[item[2]].append(item)
+            self.count += 1
+
+    def wait(self) -> None:
+        """Block until at least one call is queued."""
+        item = self.tx.get()
+        self.lanes[item[2]].append(item)
+        self.count += 1
+
+    def deliver(self, future: asyncio.Future, resolve: Any, value: Any) -> None:
+        """Hold the outcome of a call for the event loop of its future."""
+        loop = future.get_loop()
+        inbox = self.inboxes.get(loop)
+        if inbox is None:
+            inbox = self.inboxes[loop] = _Inbox(loop)
+        inbox.add((future, resolve, value))
+
+    def flush(self, force: bool = True) -> None:
+        """
+        Flush held results. Unless ``force``, only flush results held longer
+        than ``RESULT_DELAY``, and have the flusher thread watch the others, in
+        case the next call takes longer than that.
+        """
+        for inbox in self.inboxes.values():
+            if not inbox.outcomes or inbox.scheduled:
+                continue
+            if force or time.monotonic() - inbox.since >= RESULT_DELAY:
+                inbox.flush()
+            elif inbox not in _flusher.inboxes:
+                _flusher.watch(inbox)
+
+    def closing_only(self) -> bool:
+        """Whether every pending call is in the closing lane."""
+        return self.count == len(self.lanes[_CLOSING])
+
+    def pop(self) -> _TxItem:
+        lanes, passed = self.lanes, self.passed
+        lane = 0
+        while not lanes[lane]:
+            lane += 1
+        self.count -= 1
+        if self.count:
+            for lower in range(_CLOSING - 1, lane, -1):
+                if lanes[lower] and passed[lower] >= STARVATION_LIMIT:
+                    lane = lower
+                    break
+            for lower in range(lane + 1, _CLOSING):
+                if lanes[lower]:
+                    passed[lower] += 1
+        passed[lane] = 0
+        return lanes[lane].popleft()
+
+
+def _run_pending(
+    pending: _PendingCalls,
+    limit: Optional[int] = None,
+    closing: bool = True,
+) -> bool:
+    """
+    Run pending calls by priority, and resolve their futures in batches, with a
+    single threadsafe callback per event loop. Returns True if the thread should
+    stop. With a ``limit``, returns after running that many calls, even if more
+    are still pending.
+
+    The queue is drained again before each call, so newly queued calls can run
+    ahead of lower priority ones. Results are held for at most ``RESULT_DELAY``
+    before being delivered, even while later calls are still running. Calls
+    whose futures were cancelled before they started are skipped. Without
+    ``closing``, calls in the closing lane are left pending, and the function
+    returns once only those remain.
+    """
+    stopping = False
+    calls = 0
+    while limit is None or calls < limit:
+        pending.drain()
+        if not pending or (not closing and pending.closing_only()):
+            break
+        future, function, lane = pending.pop()
+
+        if future is not None and future.cancelled():
+            LOG.debug("skipping cancelled %s", function)
+            if isinstance(function, _Timed):
+                function.skip()
+            continue
+
+        if pending.inboxes:
+            pending.flush(force=False)
+        calls += 1
         try:
             LOG.debug("executing %s", function)
             result = function()
+            LOG.debug("operation %s completed", function)
 
             if future:
-                future.get_loop().call_soon_threadsafe(set_result, future, result)
-            LOG.debug("operation %s completed", function)
+                pending.deliver(future, set_result, result)
 
             if result is _STOP_RUNNING_SENTINEL:
+                stopping = True
                 break
 
         except BaseException as e:  # noqa B036
             LOG.debug("returning exception %s", e)
             if future:
-                future.get_loop().call_soon_threadsafe(set_exception, future, e)
+                pending.deliver(future, set_exception, e)
+
+    pending.flush()
+    return stopping
+
+
+def _run_queued_calls() -> None:
+    """
+    Run any calls queued behind the one currently executing on this thread.
+
+    Long-running calls can use this between units of work, so that other queries
+    don't have to wait for the whole call to finish. Closing the connection waits
+    for the current call to finish, so calls in the closing lane are left for the
+    outer loop.
+
+    :meta private:
+    """
+    _run_pending(_worker_local.pending, closing=False)
+
+
+def _connection_worker_thread(tx: _TxQueue):
+    """
+    Execute function calls on a separate thread.
+
+    Each time the thread wakes, it drains every call currently in the queue,
+    and then resolves the whole batch of futures with a single threadsafe
+    callback per event loop, rather than waking the loop once per call.
+
+    :meta private:
+    """
+    pending = _PendingCalls(tx)
+    _worker_local.pending = pending
+
+    while True:
+        # Continues running until all queue items are processed,
+        # even after connection is closed (so we can finalize all
+        # futures)
+
+        pending.wait()
+        if _run_pending(pending):
+            break
+
+
+class _ConnectionActor:
+    """
+    Run a connection's calls on a shared executor, actor style: the connection
+    is scheduled on the executor whenever calls are queued and it isn't already
+    scheduled, and each turn runs at most ``TURN_CALLS`` calls before yielding
+    the thread to other connections.
+    """
+
+    TURN_CALLS = 64
+
+    def __init__(self, executor: SharedExecutor, tx: _TxQueue) -> None:
+        self.executor = executor
+        self.pending = _PendingCalls(tx)
+        self.lock = Lock()
+        self.scheduled = False
+        self.stopped = False
+        self.database: Optional[str] = None
+        self.sharing = 0
+
+    def open(self, connector: Callable[[], _Opened]) -> _Opened:
+        """Connect, and count the connection against its database file."""
+        opened = connector()
+        cursor = opened[0].cursor()
+        cursor.row_factory = None
+        for _, name, path in cursor.execute("PRAGMA database_list"):
+            if name == "main" and path:
+                self.database = path
+                self.sharing = self.executor._opened(path)
+        cursor.close()
+        return opened
+
+    def notify(self) -> None:
+        """Schedule a turn, unless one is already scheduled."""
+        with self.lock:
+            if self.scheduled or self.stopped:
+                return
+            self.scheduled = True
+        self.executor._schedule(self.turn)
+
+    def turn(self) -> None:
+        pending = self.pending
+        _worker_local.pending = pending
+        try:
+            stopping = _run_pending(pending, self.TURN_CALLS)
+        finally:
+            _worker_local.pending = None
+
+        if stopping and self.database is not None:
+            self.executor._closed(self.database)
+            self.database = None
+
+        with self.lock:
+            if stopping:
+                self.stopped = True
+            if stopping or (not pending and pending.tx.empty()):
+                # calls queued after this check will schedule another turn
+                self.scheduled = False
+                return
+        self.executor._schedule(self.turn)
+
+
+@dataclass
+class BackupProgress:
+    """Progress of an incremental backup, as of the most recent step."""
+
+    remaining: int
+    total: int
+    elapsed: float
+
+    @property
+    def copied(self) -> int:
+        return self.total - self.remaining
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.copied / self.elapsed if self.elapsed > 0 else 0.0
 
 
 class Connection:
@@ -81,13 +463,57 @@ class Connection:
         connector: Callable[[], sqlite3.Connection],
         iter_chunk_size: int,
         loop: Optional[asyncio.AbstractEventLoop] = None,
+        *,
+        iter_prefetch: int = 0,
+        iter_chunk_target: Optional[float] = None,
+        result_cache_size: int = 0,
+        result_cache_ttl: Optional[float] = None,
+        record_latency: bool = False,
+        latency_callback: Optional[Callable[[OperationTiming], None]] = None,
+        slow_query_threshold: Optional[float] = None,
+        slow_query_callback: Optional[Callable[[SlowQuery], None]] = None,
+        track_statements: bool = False,
+        query_timeout: Optional[float] = None,
+        executor: Optional[SharedExecutor] = None,
+        pragmas: Optional[Mapping[str, PragmaValue]] = None,
     ) -> None:
         self._running = True
         self._connection: Optional[sqlite3.Connection] = None
         self._connector = connector
         self._tx: _TxQueue = SimpleQueue()
         self._iter_chunk_size = iter_chunk_size
-        self._thread = Thread(target=_connection_worker_thread, args=(self._tx,))
+        self._iter_prefetch = iter_prefetch
+        self._iter_chunk_target = iter_chunk_target
+        self._authorizer: Optional[Callable[..., int]] = None
+        self._result_cache = (
+            ResultCache(result_cache_size, result_cache_ttl)
+            if result_cache_size > 0
+            else None
+        )
+        self._latency = (
+            LatencyRecorder(latency_callback)
+            if record_latency or latency_callback is not None
+            else None
+        )
+        self._slow_query_log = (
+            SlowQueryLog(slow_query_threshold, slow_query_callback)
+            if slow_query_threshold is not None
+            else None
+        )
+        self._statement_registry = StatementRegistry() if track_statements else None
+        self._query_timeout = query_timeout
+        self._pragma_settings = dict(pragmas or {})
+        self._pragmas: dict[str, Any] = {}
+        self._progress_handler: tuple[Optional[Callable[[], Optional[int]]], int] = (
+            None,
+            0,
+        )
+        self._thread: Optional[Thread] = None
+        self._actor: Optional[_ConnectionActor] = None
+        if executor is None:
+            self._thread = Thread(target=_connection_worker_thread, args=(self._tx,))
+        else:
+            self._actor = _ConnectionActor(executor, self._tx)
 
         if loop is not None:
             warn(
@@ -128,9 +554,14 @@ class Connection:
         except Exception:
             future = None
 
-        self._tx.put_nowait((future, close_and_stop))
+        self._put((future, close_and_stop, _CLOSING))
         return future
 
+    def _put(self, item: _TxItem) -> None:
+        self._tx.put_nowait(item)
+        if self._actor is not None:
+            self._actor.notify()
+
     @property
     def _conn(self) -> sqlite3.Connection:
         if self._connection is None:
@@ -147,34 +578,273 @@ class Connection:
         cursor = self._conn.execute(sql, parameters)
         return cursor.fetchall()
 
-    async def _execute(self, fn, *args, **kwargs):
-        """Queue a function with the given arguments for execution."""
+    def _execute_columns(
+        self, sql: str, parameters: Any, types: Optional[dict[str, str]], numpy: bool
+    ) -> dict[str, Column]:
+        cursor = self._conn.execute(sql, parameters)
+        try:
+            return fetch_columns(cursor, types, numpy)
+        finally:
+            cursor.close()
+
+    def _track(
+        self, sql: Optional[str], fn: Callable[..., _T], *args: Any, **kwargs: Any
+    ) -> _T:
+        """
+        Run a call that may modify the database, then drop any cached results
+        that read tables written by the given statement, or all cached results
+        if the statement changes the schema or isn't known.
+        """
+        cache = self._result_cache
+        if cache is None:
+            return fn(*args, **kwargs)
+
+        writes = None
+        if sql is not None:
+            _, writes = cache.statement_tables(
+                self._conn, sql, self._restore_authorizer
+            )
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            cache.invalidate(writes)
+
+    def _statement(
+        self,
+        sql: str,
+        parameters: Any,
+        many: bool,
+        fn: Callable[..., _T],
+        *args: Any,
+    ) -> _T:
+        """
+        Run a call that executes the given statement, record it in the statement
+        statistics, and report it to the slow query log if it takes longer than
+        the threshold.
+        """
+        slow_query_log = self._slow_query_log
+        registry = self._statement_registry
+        if slow_query_log is None and registry is None:
+            return self._track(sql, fn, *args)
+
+        before = time.perf_counter()
+        try:
+            result = self._track(sql, fn, *args)
+        except Exception:
+            if registry is not None:
+                registry.record(sql, time.perf_counter() - before, None, error=True)
+            raise
+
+        duration = time.perf_counter() - before
+        if registry is not None:
+            registry.record(sql, duration, result_rows(result))
+        if slow_query_log is not None:
+            slow_query_log.observe(self._conn, sql, parameters, many, duration, result)
+        return result
+
+    def _execute_cached(
+        self, key: Hashable, sql: str, parameters: Any
+    ) -> list[sqlite3.Row]:
+        cache = self._result_cache
+        assert cache is not None
+        reads, writes = cache.statement_tables(
+            self._conn, sql, self._restore_authorizer
+        )
+        rows = list(
+            self._statement(
+                sql, parameters, False, self._execute_fetchall, sql, parameters
+            )
+        )
+        if writes is not None and not writes:
+            # statements that write, like INSERT ... RETURNING, must run every time
+            cache.put(key, rows, reads)
+        return list(rows)
+
+    def _set_progress_handler(
+        self, handler: Optional[Callable[[], Optional[int]]], n: int
+    ) -> None:
+        self._conn.set_progress_handler(handler, n)
+        self._progress_handler = (handler, n)
+
+    def _with_deadline(
+        self, deadline: float, timeout: float, function: Callable[[], _T]
+    ) -> _T:
+        """
+        Run a call, interrupting any statement it runs once the deadline passes,
+        and raise :class:`QueryTimeoutError` if it does.
+        """
+        if time.monotonic() >= deadline:
+            raise QueryTimeoutError(timeout)
+
+        previous = self._progress_handler
+        chained, steps = chain_steps(*previous)
+        self._set_progress_handler(deadline_handler(deadline, chained), steps)
+        try:
+            return function()
+        except QueryTimeoutError:
+            raise
+        except sqlite3.OperationalError as e:
+            if time.monotonic() >= deadline:
+                raise QueryTimeoutError(timeout) from e
+            raise
+        finally:
+            self._set_progress_handler(*previous)
+
+    def _cancellable(self, flag: CancelFlag, function: Callable[[], _T]) -> _T:
+        """
+        Run a call, aborting any statement it runs once the caller is cancelled.
+
+        Unlike :meth:`sqlite3.Connection.interrupt`, which also fails statements
+        of other calls until every statement on the connection has finished,
+        a progress handler only aborts statements run by this call.
+        """
+        previous = self._progress_handler
+        chained, steps = chain_steps(*previous)
+        handler = cancel_handler(flag, chained)
+        self._set_progress_handler(handler, steps)
+        try:
+            return function()
+        finally:
+            # unless the call replaced it, as set_progress_handler() does
+            if self._progress_handler[0] is handler:
+                self._set_progress_handler(*previous)
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        return self._query_timeout if timeout is None else timeout
+
+    def _set_authorizer(self, authorizer: Optional[Callable[..., int]]) -> None:
+        self._conn.set_authorizer(authorizer)
+        self._authorizer = authorizer
+
+    def _restore_authorizer(self) -> None:
+        if self._authorizer is not None or sys.version_info >= (3, 11):
+            self._conn.set_authorizer(self._authorizer)
+        else:
+            # authorizers can't be removed before python 3.11
+            self._conn.set_authorizer(_authorize_all)
+
+    def _insert_columns(self, sql: str, rows: Iterable[Any]) -> int:
+        if self._conn.in_transaction:
+            return self._conn.executemany(sql, rows).rowcount
+        return self._transaction_sync(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def _transaction_sync(self, fn: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+        conn = self._conn
+        if conn.in_transaction:
+            # join the open transaction, undoing only this call's changes on error
+            conn.execute("SAVEPOINT transaction_sync")
+            try:
+                result = fn(conn, *args, **kwargs)
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK TO transaction_sync")
+                    conn.execute("RELEASE transaction_sync")
+                raise
+            if conn.in_transaction:
+                conn.execute("RELEASE transaction_sync")
+            return result
+
+        conn.execute(f"BEGIN {conn.isolation_level or ''}")
+        try:
+            result = fn(conn, *args, **kwargs)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        if conn.in_transaction:
+            conn.execute("COMMIT")
+        return result
+
+    def _submit(
+        self,
+        fn,
+        *args,
+        priority: str = "normal",
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> asyncio.Future:
+        """
+        Queue a function with the given arguments, and return its future.
+
+        With a ``timeout``, the function must complete within that many seconds
+        of being queued, or fail with :class:`QueryTimeoutError`.
+        """
         if not self._running or not self._connection:
             raise ValueError("Connection closed")
-
-        function = partial(fn, *args, **kwargs)
+        lane = _LANES.get(priority)
+        if lane is None:
+            raise ValueError(f"unknown priority {priority!r}")
+
+        function: Callable[[], Any] = partial(fn, *args, **kwargs)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            function = partial(self._with_deadline, deadline, timeout, function)
         future = asyncio.get_event_loop().create_future()
+        if self._latency is not None:
+            function = self._latency.wrap(function, future)
+
+        self._put((future, function, lane))
 
-        self._tx.put_nowait((future, function))
+        return future
 
-        return await future
+    async def _execute(
+        self,
+        fn,
+        *args,
+        priority: str = "normal",
+        timeout: Optional[float] = None,
+        **kwargs,
+    ):
+        """
+        Queue a function with the given arguments for execution.
+
+        If the caller is cancelled before the function starts, it is skipped;
+        if it is already running, any query it is running is aborted.
+        """
+        flag = CancelFlag()
+        future = self._submit(
+            self._cancellable,
+            flag,
+            partial(fn, *args, **kwargs),
+            priority=priority,
+            timeout=timeout,
+        )
+        try:
+            return await future
+        except asyncio.CancelledError:
+            flag.cancelled = True
+            raise
 
     async def _connect(self) -> "Connection":
         """Connect to the actual sqlite database."""
         if self._connection is None:
             try:
                 future = asyncio.get_event_loop().create_future()
-                self._tx.put_nowait((future, self._connector))
-                self._connection = await future
+                connector = partial(_open, self._connector, self._pragma_settings)
+                if self._actor is not None:
+                    connector = partial(self._actor.open, connector)
+                self._put((future, connector, _LANES["normal"]))
+                self._connection, self._pragmas = await future
             except BaseException:
                 self.stop()
                 self._connection = None
                 raise
 
+            actor = self._actor
+            if actor is not None and actor.sharing:
+                warn(
+                    f"{actor.sharing + 1} connections using {actor.executor!r} have "
+                    f"{actor.database} open: calls waiting for its locks can occupy "
+                    "every thread, stalling the connection holding them",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+
         return self
 
     def __await__(self) -> Generator[Any, None, "Connection"]:
-        self._thread.start()
+        if self._thread is not None:
+            self._thread.start()
         return self._connect().__await__()
 
     async def __aenter__(self) -> "Connection":
@@ -188,13 +858,73 @@ class Connection:
         """Create an aiosqlite cursor wrapping a sqlite3 cursor object."""
         return Cursor(self, await self._execute(self._conn.cursor))
 
+    async def run(
+        self,
+        fn: Callable[..., _T],
+        *args: Any,
+        priority: Priority = "normal",
+        **kwargs: Any,
+    ) -> _T:
+        """
+        Run a function on the connection thread, and return its result.
+
+        The function is called with the underlying ``sqlite3.Connection`` followed
+        by the given arguments, so any number of statements, and the Python logic
+        between them, complete without returning to the event loop. The function
+        must not block on the event loop, or on other calls to this connection.
+
+        Example::
+
+            def increment(conn, key):
+                (value,) = conn.execute("SELECT v FROM t WHERE k = ?", [key]).fetchone()
+                conn.execute("UPDATE t SET v = ? WHERE k = ?", [value + 1, key])
+                return value + 1
+
+            value = await db.run(increment, "hits")
+
+        The ``priority`` of the call is not passed to the function; see
+        :meth:`execute` for details.
+        """
+        return await self._execute(
+            self._track,
+            None,
+            lambda: fn(self._conn, *args, **kwargs),
+            priority=priority,
+        )
+
+    async def transaction_sync(
+        self,
+        fn: Callable[..., _T],
+        *args: Any,
+        priority: Priority = "normal",
+        **kwargs: Any,
+    ) -> _T:
+        """
+        Run a function on the connection thread within a single transaction.
+
+        Like :meth:`run`, but wraps the call with ``BEGIN`` (using the connection's
+        isolation level) and ``COMMIT``, or ``ROLLBACK`` if the function raises.
+        If a transaction is already open, the call runs within a savepoint of it
+        instead: its changes are only committed with that transaction, and only
+        they are rolled back if the function raises.
+        """
+        return await self._execute(
+            self._track,
+            None,
+            self._transaction_sync,
+            fn,
+            *args,
+            priority=priority,
+            **kwargs,
+        )
+
     async def commit(self) -> None:
         """Commit the current transaction."""
         await self._execute(self._conn.commit)
 
     async def rollback(self) -> None:
         """Roll back the current transaction."""
-        await self._execute(self._conn.rollback)
+        await self._execute(self._track, None, self._conn.rollback)
 
     async def close(self) -> None:
         """Complete queued queries/cursors and close the connection."""
@@ -203,7 +933,8 @@ class Connection:
             return
 
         try:
-            await self._execute(self._conn.close)
+            # not cancellable, as the progress handler can't outlive the connection
+            await self._submit(self._conn.close, priority="closing")
         except Exception:
             LOG.info("exception occurred while closing connection")
             raise
@@ -211,52 +942,282 @@ class Connection:
             self._connection = None
             future = self.stop()
             if future:
-                await future
+                # the thread must stop even if closing is cancelled
+                await asyncio.shield(future)
 
     @contextmanager
     async def execute(
-        self, sql: str, parameters: Optional[Iterable[Any]] = None
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        priority: Priority = "normal",
+        timeout: Optional[float] = None,
     ) -> Cursor:
-        """Helper to create a cursor and execute the given query."""
+        """
+        Helper to create a cursor and execute the given query.
+
+        Calls on this connection run in order of ``priority``: ``"interactive"``
+        calls run ahead of ``"normal"`` calls, which run ahead of ``"bulk"`` calls,
+        though a waiting call is never passed over more than ``STARVATION_LIMIT``
+        times. Fetching from the cursor uses the same priority.
+
+        If the query doesn't complete within ``timeout`` seconds of being called,
+        including time spent waiting for other calls on this connection, it is
+        interrupted and :class:`QueryTimeoutError` is raised. Without a
+        ``timeout``, the connection's ``query_timeout`` applies, if any.
+        """
         if parameters is None:
             parameters = []
-        cursor = await self._execute(self._conn.execute, sql, parameters)
-        return Cursor(self, cursor)
+        cursor = await self._execute(
+            self._statement,
+            sql,
+            parameters,
+            False,
+            self._conn.execute,
+            sql,
+            parameters,
+            priority=priority,
+            timeout=self._timeout(timeout),
+        )
+        return Cursor(self, cursor, priority=priority)
 
     @contextmanager
     async def execute_insert(
-        self, sql: str, parameters: Optional[Iterable[Any]] = None
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        priority: Priority = "normal",
+        timeout: Optional[float] = None,
     ) -> Optional[sqlite3.Row]:
         """Helper to insert and get the last_insert_rowid."""
         if parameters is None:
             parameters = []
-        return await self._execute(self._execute_insert, sql, parameters)
+        return await self._execute(
+            self._statement,
+            sql,
+            parameters,
+            False,
+            self._execute_insert,
+            sql,
+            parameters,
+            priority=priority,
+            timeout=self._timeout(timeout),
+        )
 
     @contextmanager
     async def execute_fetchall(
-        self, sql: str, parameters: Optional[Iterable[Any]] = None
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        priority: Priority = "normal",
+        timeout: Optional[float] = None,
     ) -> Iterable[sqlite3.Row]:
         """Helper to execute a query and return all the data."""
         if parameters is None:
             parameters = []
-        return await self._execute(self._execute_fetchall, sql, parameters)
+        timeout = self._timeout(timeout)
+        cache = self._result_cache
+        observed = self._slow_query_log or self._statement_registry
+        if cache is None and observed is None:
+            return await self._execute(
+                self._execute_fetchall,
+                sql,
+                parameters,
+                priority=priority,
+                timeout=timeout,
+            )
+
+        key: Optional[Hashable] = None
+        if cache is not None and is_cacheable_statement(sql):
+            try:
+                key = (
+                    sql,
+                    _cache_params(parameters),
+                    self.row_factory,
+                    self.text_factory,
+                )
+                hash(key)
+            except TypeError:
+                # unhashable parameters can't be cached
+                key = None
+
+        if cache is None or key is None:
+            return await self._execute(
+                self._statement,
+                sql,
+                parameters,
+                False,
+                self._execute_fetchall,
+                sql,
+                parameters,
+                priority=priority,
+                timeout=timeout,
+            )
+
+        rows = cache.get(key)
+        if rows is None:
+            rows = await self._execute(
+                self._execute_cached,
+                key,
+                sql,
+                parameters,
+                priority=priority,
+                timeout=timeout,
+            )
+        return rows
+
+    async def execute_columns(
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        types: Optional[dict[str, str]] = None,
+        numpy: bool = False,
+        priority: Priority = "normal",
+        timeout: Optional[float] = None,
+    ) -> dict[str, Column]:
+        """Helper to execute a query and return all the data as columns."""
+        if parameters is None:
+            parameters = []
+        return await self._execute(
+            self._statement,
+            sql,
+            parameters,
+            False,
+            self._execute_columns,
+            sql,
+            parameters,
+            types,
+            numpy,
+            priority=priority,
+            timeout=self._timeout(timeout),
+        )
 
     @contextmanager
     async def executemany(
-        self, sql: str, parameters: Iterable[Iterable[Any]]
+        self,
+        sql: str,
+        parameters: Union[Iterable[Iterable[Any]], AsyncIterable[Iterable[Any]]],
+        *,
+        chunk_size: int = 1024,
+        priority: Priority = "normal",
+        timeout: Optional[float] = None,
     ) -> Cursor:
-        """Helper to create a cursor and execute the given multiquery."""
-        cursor = await self._execute(self._conn.executemany, sql, parameters)
-        return Cursor(self, cursor)
+        """
+        Helper to create a cursor and execute the given multiquery.
+
+        See :meth:`Cursor.executemany` for streaming parameters from an async
+        iterable.
+        """
+        if isinstance(parameters, AsyncIterable):
+            cursor = Cursor(
+                self,
+                await self._execute(self._conn.cursor, priority=priority),
+                priority=priority,
+            )
+            return await cursor.executemany(
+                sql, parameters, chunk_size=chunk_size, timeout=timeout
+            )
+
+        cursor = await self._execute(
+            self._statement,
+            sql,
+            parameters,
+            True,
+            self._conn.executemany,
+            sql,
+            parameters,
+            priority=priority,
+            timeout=self._timeout(timeout),
+        )
+        return Cursor(self, cursor, priority=priority)
+
+    async def insert_columns(self, table: str, columns: Mapping[str, Any]) -> int:
+        """
+        Insert rows into a table from columns of values, keyed by column name.
+
+        Columns can be any one-dimensional buffer (``array.array``, NumPy array,
+        etc), a sequence of values, or a :class:`Column` from :meth:`execute_columns`.
+        Rows are zipped together on the connection thread as they are inserted,
+        rather than materialized as tuples first, all within a single transaction
+        (or the current transaction, if one is already open).
+        Returns the number of rows inserted.
+
+        Example::
+
+            await db.insert_columns(
+                "readings", {"sensor": array("q", ids), "value": array("d", values)}
+            )
+
+        """
+        sql, rows = insert_rows(table, columns)
+        return await self._execute(
+            self._statement, sql, rows, True, self._insert_columns, sql, rows
+        )
+
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: Iterable[Sequence[Any]],
+        columns: Sequence[str],
+        *,
+        commit_every: int = 10000,
+        fast: bool = False,
+        defer_indexes: bool = False,
+    ) -> BulkInsertResult:
+        """
+        Load rows into a table using multi-row inserts, and report the load rate.
+
+        Each statement inserts as many rows as fit within SQLite's limit on bound
+        variables, and a transaction is committed every ``commit_every`` rows.
+        The whole load runs as a single call, so other queries queued on this
+        connection wait for it to finish, and never share a transaction with its
+        batches. If a row fails or the load is cancelled, only the current batch
+        is rolled back. If a transaction is already open, batches are loaded as
+        part of it, and are only committed with that transaction.
+
+        With ``fast``, durability is traded for speed by setting ``synchronous``
+        to ``OFF`` and growing the page cache for the duration of the load.
+        These pragmas apply to the whole connection, including the commit of a
+        transaction the load joined if it is committed before the load ends.
+        With ``defer_indexes``, the table's secondary indexes are dropped before
+        the load and rebuilt afterwards, which is usually faster for large loads.
+        Unique indexes are kept, since they enforce constraints on the new rows.
+
+        Example::
+
+            result = await db.bulk_insert("events", rows, ["ts", "kind", "data"])
+            print(f"{result.rows_per_second:.0f} rows/s")
+
+        """
+        loader = BulkLoader(
+            self._conn, table, rows, columns, commit_every, fast, defer_indexes
+        )
+        return await self._execute(self._track, None, loader.run)
 
     @contextmanager
     async def executescript(self, sql_script: str) -> Cursor:
         """Helper to create a cursor and execute a user script."""
-        cursor = await self._execute(self._conn.executescript, sql_script)
+        cursor = await self._execute(
+            self._track, None, self._conn.executescript, sql_script
+        )
         return Cursor(self, cursor)
 
+    def pipeline(self) -> Pipeline:
+        """Create a pipeline to run a sequence of operations in a single job."""
+        return Pipeline(self)
+
     async def interrupt(self) -> None:
-        """Interrupt pending queries."""
+        """
+        Interrupt pending queries.
+
+        To stop a single query instead, cancel the task awaiting it: queries that
+        have not started yet are skipped, and a running query is interrupted.
+        As with any interrupted write, SQLite may roll back the open transaction.
+        """
         return self._conn.interrupt()
 
     async def create_function(
@@ -281,6 +1242,56 @@ class Connection:
             deterministic=deterministic,
         )
 
+    def cache_stats(self) -> Optional[CacheStats]:
+        """Return result cache counters, or ``None`` if caching is disabled."""
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    def clear_cache(self) -> None:
+        """Drop all cached query results."""
+        if self._result_cache is not None:
+            self._result_cache.invalidate(None)
+
+    def latency_stats(self) -> Optional[LatencyStats]:
+        """
+        Return histograms of time spent waiting for the connection thread,
+        executing on it, and waiting for the event loop to deliver results,
+        along with the number of operations currently queued. Returns ``None``
+        unless the connection was opened with ``record_latency=True``.
+        """
+        if self._latency is None:
+            return None
+        return self._latency.stats()
+
+    def reset_latency_stats(self) -> None:
+        """Clear all recorded latency histograms."""
+        if self._latency is not None:
+            self._latency.reset()
+
+    def statement_stats(self) -> Optional[list[StatementStats]]:
+        """
+        Return execution statistics for each normalized statement run through
+        this connection, by descending total time. Returns ``None`` unless the
+        connection was opened with ``track_statements=True``.
+        """
+        if self._statement_registry is None:
+            return None
+        return self._statement_registry.snapshot()
+
+    def reset_statement_stats(self) -> None:
+        """Clear all recorded statement statistics."""
+        if self._statement_registry is not None:
+            self._statement_registry.reset()
+
+    @property
+    def pragmas(self) -> dict[str, Any]:
+        """
+        Effective values of the pragmas set when connecting, from the connection
+        profile and custom ``pragmas``, as read back after setting them.
+        """
+        return dict(self._pragmas)
+
     @property
     def in_transaction(self) -> bool:
         return self._conn.in_transaction
@@ -322,7 +1333,7 @@ class Connection:
     async def set_progress_handler(
         self, handler: Callable[[], Optional[int]], n: int
     ) -> None:
-        await self._execute(self._conn.set_progress_handler, handler, n)
+        await self._execute(self._set_progress_handler, handler, n)
 
     async def set_trace_callback(self, handler: Callable) -> None:
         await self._execute(self._conn.set_trace_callback, handler)
@@ -369,7 +1380,7 @@ class Connection:
 
             Pass ``None`` to remove the authorizer.
         """
-        await self._execute(self._conn.set_authorizer, authorizer_callback)
+        await self._execute(self._set_authorizer, authorizer_callback)
 
     async def iterdump(self) -> AsyncIterator[str]:
         """
@@ -380,38 +1391,39 @@ class Connection:
             async for line in db.iterdump():
                 ...
 
+        Lines are produced on the connection thread in batches of
+        ``iter_chunk_size``, with at most one batch prepared ahead of the lines
+        being consumed, so dumping pauses whenever the consumer falls behind.
+        Other queries on this connection may run between batches.
         """
-        dump_queue: Queue = Queue()
-
-        def dumper():
-            try:
-                for line in self._conn.iterdump():
-                    dump_queue.put_nowait(line)
-                dump_queue.put_nowait(None)
-
-            except Exception:
-                LOG.exception("exception while dumping db")
-                dump_queue.put_nowait(None)
-                raise
+        dump: Optional[Generator[str, None, None]] = None
 
-        fut = self._execute(dumper)
-        task = asyncio.ensure_future(fut)
+        def next_batch(size: int) -> list[str]:
+            nonlocal dump
+            if dump is None:
+                dump = self._conn.iterdump()
+            return list(islice(dump, size))
 
-        while True:
-            try:
-                line: Optional[str] = dump_queue.get_nowait()
-                if line is None:
-                    break
-                yield line
-
-            except Empty:
-                if task.done():
-                    LOG.warning("iterdump completed unexpectedly")
-                    break
+        def close_dump() -> None:
+            if dump is not None:
+                dump.close()
 
-                await asyncio.sleep(0.01)
-
-        await task
+        size = self._iter_chunk_size
+        future: Optional[asyncio.Future] = self._submit(next_batch, size)
+        try:
+            while future is not None:
+                lines = await future
+                future = None
+                if len(lines) == size:
+                    future = self._submit(next_batch, size)
+                for line in lines:
+                    yield line
+        finally:
+            if future is not None:
+                future.cancel()
+                if self._running and self._connection is not None:
+                    # finalize the abandoned dump on the connection thread
+                    self._submit(close_dump)
 
     async def backup(
         self,
@@ -439,15 +1451,156 @@ class Connection:
             sleep=sleep,
         )
 
+    async def iterbackup(
+        self,
+        target: Union["Connection", sqlite3.Connection],
+        *,
+        pages: int = 64,
+        name: str = "main",
+        sleep: float = 0.250,
+    ) -> AsyncIterator[BackupProgress]:
+        """
+        Incrementally back up the current database to the target database.
+
+        Copies ``pages`` pages at a time, and runs any other queries queued on this
+        connection between steps, rather than blocking them until the backup is
+        complete. Yields the progress after each step, and must be iterated to
+        completion to finish the backup; if iteration stops early, the backup is
+        abandoned after the current step.
+
+        Example::
+
+            async for progress in db.iterbackup(target, pages=256):
+                print(f"{progress.copied}/{progress.total} pages copied")
+
+        """
+        if pages < 1:
+            raise ValueError("incremental backups must copy at least one page")
+
+        if isinstance(target, Connection):
+            target = target._conn
+
+        loop = asyncio.get_event_loop()
+        steps: asyncio.Queue[Optional[BackupProgress]] = asyncio.Queue()
+        started = time.monotonic()
+
+        abandoned = False
+
+        def step(status: int, remaining: int, total: int) -> None:
+            if abandoned:
+                raise sqlite3.OperationalError("backup abandoned")
+            elapsed = time.monotonic() - started
+            loop.call_soon_threadsafe(
+                steps.put_nowait, BackupProgress(remaining, total, elapsed)
+            )
+            _run_queued_calls()
+
+        future = self._submit(
+            self._conn.backup,
+            target,
+            pages=pages,
+            progress=step,
+            name=name,
+            sleep=sleep,
+        )
+        future.add_done_callback(lambda _: steps.put_nowait(None))
+
+        try:
+            while True:
+                progress = await steps.get()
+                if progress is None:
+                    break
+                yield progress
+        finally:
+            if not future.done():
+                # wait for the current step, so the target can be closed safely
+                abandoned = True
+                with suppress(Exception):
+                    await future
+
+        await future
+
 
 def connect(
     database: Union[str, Path],
     *,
     iter_chunk_size=64,
+    iter_prefetch: int = 0,
+    iter_chunk_target: Optional[float] = None,
+    result_cache_size: int = 0,
+    result_cache_ttl: Optional[float] = None,
+    record_latency: bool = False,
+    latency_callback: Optional[Callable[[OperationTiming], None]] = None,
+    slow_query_threshold: Optional[float] = None,
+    slow_query_callback: Optional[Callable[[SlowQuery], None]] = None,
+    track_statements: bool = False,
+    query_timeout: Optional[float] = None,
+    executor: Optional[SharedExecutor] = None,
+    profile: Optional[Profile] = None,
+    pragmas: Optional[Mapping[str, PragmaValue]] = None,
     loop: Optional[asyncio.AbstractEventLoop] = None,
     **kwargs: Any,
 ) -> Connection:
-    """Create and return a connection proxy to the sqlite database."""
+    """
+    Create and return a connection proxy to the sqlite database.
+
+    When iterating over cursors, rows are fetched from the connection thread in
+    chunks of ``iter_chunk_size``. Setting ``iter_prefetch`` requests up to that
+    many further chunks ahead of the rows being consumed, trading a bounded amount
+    of memory for overlapping SQLite work with processing on the event loop.
+    Abandoning an iteration early discards any rows that were prefetched.
+
+    Setting ``iter_chunk_target`` (in seconds) makes each cursor adapt its chunk
+    size as it iterates, starting from ``iter_chunk_size``, so that fetching and
+    consuming each chunk takes roughly that long. Chunks are also capped to a
+    few megabytes, based on the size of the rows being fetched.
+
+    Setting ``result_cache_size`` caches up to that many results of
+    :meth:`Connection.execute_fetchall`, keyed by query and parameters, and
+    optionally expiring after ``result_cache_ttl`` seconds. Cached results are
+    dropped whenever a statement run through this connection writes to any table
+    they read from. Writes made by other connections are not detected.
+
+    Setting ``record_latency`` times every operation as it is queued, run on
+    the connection thread, and delivered back to the event loop, available from
+    :meth:`Connection.latency_stats`. A ``latency_callback`` is also called from
+    the event loop with the :class:`OperationTiming` of each operation.
+
+    Setting ``slow_query_threshold`` logs a warning for any statement that takes
+    at least that many seconds to execute, with its parameter shape, row count,
+    and ``EXPLAIN QUERY PLAN`` output, flagging any full table scans. The same
+    details are passed as a :class:`SlowQuery` to ``slow_query_callback``, which
+    is called from the connection thread. For :meth:`Connection.execute` and
+    :meth:`Cursor.execute`, only running the statement up to its first row is
+    timed: rows fetched from the cursor afterwards are not, and the row count of
+    a query is unknown. Use :meth:`Connection.execute_fetchall` to time a query
+    with all of its rows.
+
+    Setting ``track_statements`` aggregates call counts, errors, rows, and
+    execution time for each distinct statement, after normalizing away literal
+    values, available from :meth:`Connection.statement_stats`.
+
+    Setting ``query_timeout`` (in seconds) gives every query a default timeout,
+    as described in :meth:`Connection.execute`, including fetches from cursors.
+    This is separate from the ``timeout`` passed to :func:`sqlite3.connect`,
+    which limits how long to wait for database locks.
+
+    By default, each connection runs its calls on a thread of its own. Passing a
+    :class:`SharedExecutor` runs them on the executor's threads instead, shared
+    with any other connections using it, while still running the calls of each
+    connection one at a time, in order. Connections sharing an executor should
+    each open a different file: calls waiting on another connection's lock hold
+    a shared thread until the busy timeout expires, which can leave the holder
+    without a thread to release it.
+
+    Setting ``profile`` applies a named set of performance pragmas, one of
+    ``"read_heavy"``, ``"write_heavy"``, ``"bulk_load"``, or ``"ephemeral"``
+    (see ``aiosqlite.profiles.PROFILES``), and ``pragmas`` maps further pragma
+    names to values, overriding the profile. Both are applied on the connection
+    thread as part of connecting, without extra round trips, and their effective
+    values are available from :attr:`Connection.pragmas`. A ``timeout`` given to
+    :func:`sqlite3.connect` takes precedence over the profile's busy timeout.
+    """
 
     if loop is not None:
         warn(
@@ -455,6 +1608,12 @@ def connect(
             DeprecationWarning,
         )
 
+    if executor is not None:
+        # calls may run on any of the executor's threads, but never concurrently
+        kwargs.setdefault("check_same_thread", False)
+
+    settings = pragma_settings(profile, pragmas, busy_timeout="timeout" not in kwargs)
+
     def connector() -> sqlite3.Connection:
         if isinstance(database, str):
             loc = database
@@ -465,4 +1624,19 @@ def connect(
 
         return sqlite3.connect(loc, **kwargs)
 
-    return Connection(connector, iter_chunk_size)
+    return Connection(
+        connector,
+        iter_chunk_size,
+        iter_prefetch=iter_prefetch,
+        iter_chunk_target=iter_chunk_target,
+        result_cache_size=result_cache_size,
+        result_cache_ttl=result_cache_ttl,
+        record_latency=record_latency,
+        latency_callback=latency_callback,
+        slow_query_threshold=slow_query_threshold,
+        slow_query_callback=slow_query_callback,
+        track_statements=track_statements,
+        query_timeout=query_timeout,
+        executor=executor,
+        pragmas=settings,
+    )
@@ -1,17 +1,36 @@
 # Copyright Amethyst Reese
 # Licensed under the MIT license
 
+import asyncio
 import sqlite3
-from collections.abc import AsyncIterator, Iterable
-from typing import Any, Callable, Optional, TYPE_CHECKING
+import sys
+import time
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from typing import Any, Callable, Optional, TYPE_CHECKING, Union
+
+from .columns import Column, fetch_columns
 
 if TYPE_CHECKING:
-    from .core import Connection
+    from .core import Connection, Priority
+
+_MIN_CHUNK_SIZE = 16
+_MAX_CHUNK_SIZE = 16384
+_MAX_CHUNK_BYTES = 4 * 1024 * 1024
 
 
 class Cursor:
-    def __init__(self, conn: "Connection", cursor: sqlite3.Cursor) -> None:
+    def __init__(
+        self,
+        conn: "Connection",
+        cursor: sqlite3.Cursor,
+        *,
+        priority: "Priority" = "normal",
+    ) -> None:
+        self.priority = priority
         self.iter_chunk_size = conn._iter_chunk_size
+        self.iter_prefetch = conn._iter_prefetch
+        self.iter_chunk_target = conn._iter_chunk_target
         self._conn = conn
         self._cursor = cursor
 
@@ -19,53 +38,226 @@ class Cursor:
         """The cursor proxy is also an async iterator."""
         return self._fetch_chunked()
 
+    def _fetchmany_timed(self, size: int) -> tuple[list[Any], float]:
+        before = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        return rows, time.perf_counter() - before
+
+    def _tune_chunk_size(
+        self, target: float, rows: list[Any], fetch_time: float, consume_time: float
+    ) -> None:
+        """
+        Scale `iter_chunk_size` so that fetching and consuming a chunk takes
+        roughly `target` seconds, without exceeding a memory budget.
+        """
+        elapsed = fetch_time + consume_time
+        scale = target / elapsed if elapsed > 0 else 2.0
+        size = int(len(rows) * min(2.0, max(0.5, scale)))
+
+        row = rows[0]
+        row_bytes = sys.getsizeof(row)
+        try:
+            row_bytes += sum(sys.getsizeof(value) for value in row)
+        except TypeError:  # custom row factory
+            pass
+        size = min(size, _MAX_CHUNK_BYTES // row_bytes)
+
+        self.iter_chunk_size = min(_MAX_CHUNK_SIZE, max(_MIN_CHUNK_SIZE, size))
+
     async def _fetch_chunked(self):
-        while True:
-            rows = await self.fetchmany(self.iter_chunk_size)
-            if not rows:
-                return
-            for row in rows:
-                yield row
+        # Keep up to `iter_prefetch` chunks requested ahead of the chunk currently
+        # being consumed, so the connection thread can step through the next rows
+        # while the caller is busy processing these ones.
+        pending: deque[tuple[int, asyncio.Future]] = deque()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) <= self.iter_prefetch:
+                    size = self.iter_chunk_size
+                    future = self._conn._submit(
+                        self._fetchmany_timed,
+                        size,
+                        priority=self.priority,
+                        timeout=self._conn._timeout(None),
+                    )
+                    pending.append((size, future))
+                if not pending:
+                    return
+
+                size, future = pending.popleft()
+                rows, fetch_time = await future
+                if len(rows) < size:
+                    exhausted = True
+
+                before = time.perf_counter()
+                for row in rows:
+                    yield row
+
+                target = self.iter_chunk_target
+                if target and not exhausted:
+                    consume_time = time.perf_counter() - before
+                    self._tune_chunk_size(target, rows, fetch_time, consume_time)
+        finally:
+            for _, future in pending:
+                future.cancel()
 
     async def _execute(self, fn, *args, **kwargs):
         """Execute the given function on the shared connection's thread."""
-        return await self._conn._execute(fn, *args, **kwargs)
+        return await self._conn._execute(fn, *args, priority=self.priority, **kwargs)
 
     async def execute(
-        self, sql: str, parameters: Optional[Iterable[Any]] = None
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        priority: Optional["Priority"] = None,
+        timeout: Optional[float] = None,
     ) -> "Cursor":
-        """Execute the given query."""
+        """
+        Execute the given query.
+
+        If given, ``priority`` replaces the cursor's priority, which is also used
+        for fetching the results. See :meth:`Connection.execute` for ``timeout``.
+        """
         if parameters is None:
             parameters = []
-        await self._execute(self._cursor.execute, sql, parameters)
+        if priority is not None:
+            self.priority = priority
+        await self._execute(
+            self._conn._statement,
+            sql,
+            parameters,
+            False,
+            self._cursor.execute,
+            sql,
+            parameters,
+            timeout=self._conn._timeout(timeout),
+        )
         return self
 
     async def executemany(
-        self, sql: str, parameters: Iterable[Iterable[Any]]
+        self,
+        sql: str,
+        parameters: Union[Iterable[Iterable[Any]], AsyncIterable[Iterable[Any]]],
+        *,
+        chunk_size: int = 1024,
+        priority: Optional["Priority"] = None,
+        timeout: Optional[float] = None,
     ) -> "Cursor":
-        """Execute the given multiquery."""
-        await self._execute(self._cursor.executemany, sql, parameters)
+        """
+        Execute the given multiquery.
+
+        Parameters may also come from an async iterable, in which case they are
+        executed in chunks of ``chunk_size``, while the next chunk is gathered.
+        At most two chunks are held in memory at once. Afterwards, ``rowcount``
+        only reflects the final chunk.
+
+        If given, ``priority`` replaces the cursor's priority. The ``timeout``
+        applies to each chunk separately.
+        """
+        if priority is not None:
+            self.priority = priority
+        timeout = self._conn._timeout(timeout)
+        if not isinstance(parameters, AsyncIterable):
+            await self._execute(
+                self._conn._statement,
+                sql,
+                parameters,
+                True,
+                self._cursor.executemany,
+                sql,
+                parameters,
+                timeout=timeout,
+            )
+            return self
+
+        pending: Optional[asyncio.Future] = None
+        chunk: list[Iterable[Any]] = []
+        try:
+            async for params in parameters:
+                chunk.append(params)
+                if len(chunk) >= chunk_size:
+                    if pending is not None:
+                        await pending
+                    pending = self._conn._submit(
+                        self._conn._statement,
+                        sql,
+                        chunk,
+                        True,
+                        self._cursor.executemany,
+                        sql,
+                        chunk,
+                        priority=self.priority,
+                        timeout=timeout,
+                    )
+                    chunk = []
+
+            if pending is not None:
+                await pending
+            if chunk or pending is None:
+                await self._execute(
+                    self._conn._statement,
+                    sql,
+                    chunk,
+                    True,
+                    self._cursor.executemany,
+                    sql,
+                    chunk,
+                    timeout=timeout,
+                )
+
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
         return self
 
     async def executescript(self, sql_script: str) -> "Cursor":
         """Execute a user script."""
-        await self._execute(self._cursor.executescript, sql_script)
+        await self._execute(
+            self._conn._track, None, self._cursor.executescript, sql_script
+        )
         return self
 
-    async def fetchone(self) -> Optional[sqlite3.Row]:
+    async def fetchone(
+        self, *, timeout: Optional[float] = None
+    ) -> Optional[sqlite3.Row]:
         """Fetch a single row."""
-        return await self._execute(self._cursor.fetchone)
+        return await self._execute(
+            self._cursor.fetchone, timeout=self._conn._timeout(timeout)
+        )
 
-    async def fetchmany(self, size: Optional[int] = None) -> Iterable[sqlite3.Row]:
+    async def fetchmany(
+        self, size: Optional[int] = None, *, timeout: Optional[float] = None
+    ) -> Iterable[sqlite3.Row]:
         """Fetch up to `cursor.arraysize` number of rows."""
         args: tuple[int, ...] = ()
         if size is not None:
             args = (size,)
-        return await self._execute(self._cursor.fetchmany, *args)
+        return await self._execute(
+            self._cursor.fetchmany, *args, timeout=self._conn._timeout(timeout)
+        )
 
-    async def fetchall(self) -> Iterable[sqlite3.Row]:
+    async def fetchall(
+        self, *, timeout: Optional[float] = None
+    ) -> Iterable[sqlite3.Row]:
         """Fetch all remaining rows."""
-        return await self._execute(self._cursor.fetchall)
+        return await self._execute(
+            self._cursor.fetchall, timeout=self._conn._timeout(timeout)
+        )
+
+    async def fetch_columns(
+        self, *, types: Optional[dict[str, str]] = None, numpy: bool = False
+    ) -> dict[str, Column]:
+        """
+        Fetch all remaining rows as columns of values, keyed by column name.
+
+        Numeric columns are built directly into ``array.array`` buffers on the
+        connection thread, without keeping a tuple per row. Column types are
+        inferred from their values, or can be given as array typecodes in
+        ``types``. Set ``numpy`` to get NumPy arrays instead (requires numpy).
+        """
+        return await self._execute(fetch_columns, self._cursor, types, numpy)
 
     async def close(self) -> None:
         """Close the cursor."""
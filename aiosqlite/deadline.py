@@ -0,0 +1,100 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Per-query deadlines and cancellation, enforced on the connection thread by
+progress handlers
+"""
+
+import sqlite3
+import time
+from typing import Callable, Optional, Tuple
+
+__all__ = ["QueryTimeoutError"]
+
+# virtual machine instructions between deadline and cancellation checks
+PROGRESS_STEPS = 1000
+
+ProgressHandler = Callable[[], Optional[int]]
+
+
+class QueryTimeoutError(sqlite3.OperationalError, TimeoutError):
+    """
+    A query did not complete within its timeout, including any time it spent
+    waiting in the connection's queue. The statement was interrupted, and the
+    connection remains usable.
+    """
+
+    def __init__(self, timeout: float) -> None:
+        super().__init__(f"query timed out after {timeout:g}s")
+        self.timeout = timeout
+
+
+def chain_steps(
+    handler: Optional[ProgressHandler], n: int
+) -> Tuple[Optional[ProgressHandler], int]:
+    """
+    Return the handler to chain in place of a user's progress handler, and the
+    steps between checks, so that the user's handler still runs every ``n``
+    steps, give or take :data:`PROGRESS_STEPS`.
+    """
+    if handler is None or n < 1:
+        return None, PROGRESS_STEPS
+    if n <= PROGRESS_STEPS:
+        return handler, n
+
+    every = n // PROGRESS_STEPS
+    checks = 0
+
+    def nth() -> Optional[int]:
+        nonlocal checks
+        checks += 1
+        if checks < every:
+            return 0
+        checks = 0
+        return handler()
+
+    return nth, PROGRESS_STEPS
+
+
+def deadline_handler(
+    deadline: float, chained: Optional[ProgressHandler]
+) -> ProgressHandler:
+    """
+    Return a progress handler that aborts the running statement once the
+    deadline (in :func:`time.monotonic` seconds) passes, or when the chained
+    handler returns a true value.
+    """
+
+    def check() -> Optional[int]:
+        if time.monotonic() >= deadline:
+            return 1
+        return chained() if chained is not None else 0
+
+    return check
+
+
+class CancelFlag:
+    """Set from the event loop once the call it belongs to is cancelled."""
+
+    __slots__ = ("cancelled",)
+
+    def __init__(self) -> None:
+        self.cancelled = False
+
+
+def cancel_handler(
+    flag: CancelFlag, chained: Optional[ProgressHandler]
+) -> ProgressHandler:
+    """
+    Return a progress handler that aborts the running statement once the call
+    running it has been cancelled, or when the chained handler returns a true
+    value.
+    """
+
+    def check() -> Optional[int]:
+        if flag.cancelled:
+            return 1
+        return chained() if chained is not None else 0
+
+    return check
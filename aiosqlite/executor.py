@@ -0,0 +1,127 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Bounded set of worker threads shared by many connections
+"""
+
+import logging
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import Callable, Optional
+
+__all__ = ["SharedExecutor"]
+
+LOG = logging.getLogger("aiosqlite")
+
+
+class SharedExecutor:
+    """
+    Run the calls of many connections on at most ``max_threads`` threads.
+
+    By default, every connection starts its own thread, which sits idle while
+    the connection isn't in use. Connections given a shared executor instead
+    take turns on its threads: calls on each connection still run one at a
+    time, in order, but only while that connection has calls queued. Threads
+    are started as needed, and reused as connections are opened and closed.
+
+    Example::
+
+        executor = aiosqlite.SharedExecutor(max_threads=8)
+        async with aiosqlite.connect(path, executor=executor) as db:
+            ...
+        executor.shutdown()
+
+    Connections using the executor should be closed before shutting it down.
+
+    Each connection should open a different database file. A call waiting for a
+    lock, up to the connection's busy timeout, keeps its thread busy, so with
+    several connections to the same file, calls waiting for a lock can occupy
+    every thread while the connection holding it waits for a thread to commit,
+    stalling both until the timeout expires. A :class:`RuntimeWarning` is
+    raised when a second connection using the executor opens the same file.
+    """
+
+    def __init__(self, max_threads: int = 4, *, name: str = "aiosqlite") -> None:
+        if max_threads < 1:
+            raise ValueError("max_threads must be at least 1")
+        self.max_threads = max_threads
+        self.name = name
+        self._ready: SimpleQueue[Optional[Callable[[], None]]] = SimpleQueue()
+        self._lock = Lock()
+        self._threads: list[Thread] = []
+        self._idle = 0
+        self._shutdown = False
+        self._files: dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"<{type(self).__name__} threads={len(self._threads)}"
+            f"/{self.max_threads}>"
+        )
+
+    def __enter__(self) -> "SharedExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    @property
+    def threads(self) -> int:
+        """Number of threads started so far."""
+        return len(self._threads)
+
+    def _schedule(self, turn: Callable[[], None]) -> None:
+        """Run a connection's turn on the next available thread."""
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("executor has been shut down")
+            if self._idle == 0 and len(self._threads) < self.max_threads:
+                thread = Thread(
+                    target=self._work,
+                    name=f"{self.name}-{len(self._threads)}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._ready.put(turn)
+
+    def _opened(self, path: str) -> int:
+        """Count a connection to the given file, returning how many were open."""
+        with self._lock:
+            count = self._files.get(path, 0)
+            self._files[path] = count + 1
+        return count
+
+    def _closed(self, path: str) -> None:
+        with self._lock:
+            count = self._files.pop(path) - 1
+            if count:
+                self._files[path] = count
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                self._idle += 1
+            turn = self._ready.get()
+            with self._lock:
+                self._idle -= 1
+            if turn is None:
+                break
+            try:
+                turn()
+            except Exception:  # pragma: no cover
+                LOG.exception("unexpected error in shared executor thread")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop every thread once it finishes any turn already queued."""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._ready.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,236 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Timing of operations as they pass through the connection thread
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Optional
+
+__all__ = ["LatencyHistogram", "LatencyStats", "OperationTiming"]
+
+# bucket upper bounds double from one microsecond to a little over an hour
+_BUCKETS = 33
+_RESOLUTION = 1e-6
+
+
+@dataclass(frozen=True)
+class OperationTiming:
+    """
+    Timestamps of a single operation, from :func:`time.perf_counter`.
+
+    ``enqueued`` is when the operation was queued for the connection thread,
+    ``started`` and ``finished`` bracket its execution on that thread, and
+    ``resolved`` is when the event loop got around to waking the caller.
+    ``queue_depth`` is the number of operations that were still waiting to
+    start when this one was queued.
+    """
+
+    enqueued: float
+    started: float
+    finished: float
+    resolved: float
+    queue_depth: int
+
+    @property
+    def queue_wait(self) -> float:
+        return self.started - self.enqueued
+
+    @property
+    def execute_time(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def delivery_lag(self) -> float:
+        return self.resolved - self.finished
+
+    @property
+    def total(self) -> float:
+        return self.resolved - self.enqueued
+
+
+class LatencyHistogram:
+    """
+    Distribution of durations, in buckets whose upper bounds double from one
+    microsecond upwards. Percentiles are reported as the upper bound of the
+    bucket they fall into.
+    """
+
+    def __init__(self) -> None:
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        ticks = int(seconds / _RESOLUTION)
+        self.counts[min(ticks.bit_length(), _BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Return the duration that ``percent`` of recorded values fall within."""
+        if not 0 <= percent <= 100:
+            raise ValueError("percent must be between 0 and 100")
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= threshold:
+                return min((1 << bucket) * _RESOLUTION, self.max)
+        return self.max
+
+    def buckets(self) -> list[tuple[float, int]]:
+        """Return ``(upper bound, count)`` pairs for every non-empty bucket."""
+        return [
+            ((1 << bucket) * _RESOLUTION, count)
+            for bucket, count in enumerate(self.counts)
+            if count
+        ]
+
+    def copy(self) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.total = self.total
+        histogram.max = self.max
+        return histogram
+
+    def __repr__(self) -> str:
+        return (
+            f"<LatencyHistogram count={self.count} mean={self.mean:.6f} "
+            f"p99={self.percentile(99):.6f} max={self.max:.6f}>"
+        )
+
+
+@dataclass
+class LatencyStats:
+    """Latency histograms of a connection's operations."""
+
+    queue_wait: LatencyHistogram
+    execute_time: LatencyHistogram
+    delivery_lag: LatencyHistogram
+    queue_depth: int
+
+
+class _Timed:
+    """
+    Wraps a queued function to record when the connection thread runs it.
+
+    :meta private:
+    """
+
+    __slots__ = (
+        "function",
+        "recorder",
+        "enqueued",
+        "queue_depth",
+        "started",
+        "finished",
+    )
+
+    def __init__(
+        self, function: Callable[[], Any], recorder: "LatencyRecorder"
+    ) -> None:
+        self.function = function
+        self.recorder = recorder
+        self.enqueued = time.perf_counter()
+        self.queue_depth = recorder.submitted - recorder.started
+        self.started = 0.0
+        self.finished = 0.0
+
+    def __call__(self) -> Any:
+        self.started = time.perf_counter()
+        self.recorder.started += 1
+        try:
+            return self.function()
+        finally:
+            self.finished = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return repr(self.function)
+
+    def skip(self) -> None:
+        """Count a call that was cancelled before it started as no longer queued."""
+        self.recorder.started += 1
+
+    def resolved(self, future: asyncio.Future) -> None:
+        if future.cancelled() or not self.finished:
+            return
+        timing = OperationTiming(
+            enqueued=self.enqueued,
+            started=self.started,
+            finished=self.finished,
+            resolved=time.perf_counter(),
+            queue_depth=self.queue_depth,
+        )
+        self.recorder.record(timing)
+
+
+class LatencyRecorder:
+    """
+    Collects operation timings for a connection.
+
+    Operations are counted as they are submitted from the event loop, and as
+    they are started or skipped by the connection thread, which is the only
+    thread that increments ``started``; the difference is the current queue
+    depth.
+
+    :meta private:
+    """
+
+    def __init__(self, callback: Optional[Callable[[OperationTiming], None]]) -> None:
+        self.callback = callback
+        self.submitted = 0
+        self.started = 0
+        self._lock = Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.queue_wait = LatencyHistogram()
+        self.execute_time = LatencyHistogram()
+        self.delivery_lag = LatencyHistogram()
+
+    def wrap(self, function: Callable[[], Any], future: asyncio.Future) -> _Timed:
+        timed = _Timed(function, self)
+        self.submitted += 1
+        future.add_done_callback(timed.resolved)
+        return timed
+
+    def record(self, timing: OperationTiming) -> None:
+        with self._lock:
+            self.queue_wait.record(timing.queue_wait)
+            self.execute_time.record(timing.execute_time)
+            self.delivery_lag.record(timing.delivery_lag)
+        if self.callback is not None:
+            self.callback(timing)
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.submitted - self.started)
+
+    def stats(self) -> LatencyStats:
+        with self._lock:
+            return LatencyStats(
+                queue_wait=self.queue_wait.copy(),
+                execute_time=self.execute_time.copy(),
+                delivery_lag=self.delivery_lag.copy(),
+                queue_depth=self.queue_depth,
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
@@ -0,0 +1,142 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Batch multiple operations into a single trip to the connection thread
+"""
+
+import sqlite3
+from collections.abc import Iterable
+from typing import Any, Optional, TYPE_CHECKING
+
+from .cursor import Cursor
+
+if TYPE_CHECKING:
+    from .core import Connection
+
+__all__ = ["Pipeline", "PipelineError"]
+
+
+class PipelineError(sqlite3.Error):
+    """
+    An operation in a pipeline failed.
+
+    The original exception is available as ``__cause__``, the position of the
+    failing operation as ``index``, and the results of all operations that
+    completed before it as ``results``.
+    """
+
+    def __init__(self, index: int, error: BaseException, results: list[Any]) -> None:
+        super().__init__(f"pipeline operation {index} failed: {error!r}")
+        self.index = index
+        self.results = results
+
+
+class Pipeline:
+    """
+    Record a sequence of operations, then run them all in one worker job.
+
+    Each recording method returns the index of its result in ``results``.
+    Fetch operations apply to the most recently executed statement.
+    Execute operations produce a :class:`Cursor` for that statement.
+
+    Example::
+
+        async with db.pipeline() as pipe:
+            pipe.execute("INSERT INTO foo (k) VALUES (?)", [1])
+            pipe.execute("SELECT last_insert_rowid()")
+            pipe.fetchone()
+            pipe.commit()
+
+        cursor, _, (rowid,), _ = pipe.results
+
+    """
+
+    def __init__(self, conn: "Connection") -> None:
+        self._conn = conn
+        self._ops: list[tuple[str, tuple[Any, ...]]] = []
+        self.results: Optional[list[Any]] = None
+
+    def _record(self, op: str, *args: Any) -> int:
+        if self.results is not None:
+            raise ValueError("Pipeline already run")
+        self._ops.append((op, args))
+        return len(self._ops) - 1
+
+    def execute(self, sql: str, parameters: Optional[Iterable[Any]] = None) -> int:
+        """Record executing the given query."""
+        if parameters is None:
+            parameters = []
+        return self._record("execute", sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterable[Iterable[Any]]) -> int:
+        """Record executing the given multiquery."""
+        return self._record("executemany", sql, parameters)
+
+    def fetchone(self) -> int:
+        """Record fetching a single row."""
+        return self._record("fetchone")
+
+    def fetchmany(self, size: Optional[int] = None) -> int:
+        """Record fetching up to `cursor.arraysize` number of rows."""
+        return self._record("fetchmany", *(() if size is None else (size,)))
+
+    def fetchall(self) -> int:
+        """Record fetching all remaining rows."""
+        return self._record("fetchall")
+
+    def commit(self) -> int:
+        """Record committing the current transaction."""
+        return self._record("commit")
+
+    def rollback(self) -> int:
+        """Record rolling back the current transaction."""
+        return self._record("rollback")
+
+    def _run_ops(self, ops: list[tuple[str, tuple[Any, ...]]]) -> list[Any]:
+        conn = self._conn._conn
+        cursor: Optional[sqlite3.Cursor] = None
+        results: list[Any] = []
+
+        for index, (op, args) in enumerate(ops):
+            try:
+                if op in ("execute", "executemany"):
+                    sql, parameters = args
+                    cursor = self._conn._statement(
+                        sql, parameters, op == "executemany", getattr(conn, op), *args
+                    )
+                    result: Any = cursor
+                elif op in ("commit", "rollback"):
+                    result = getattr(conn, op)()
+                elif cursor is None:
+                    raise sqlite3.ProgrammingError("no statement executed to fetch")
+                else:
+                    result = getattr(cursor, op)(*args)
+            except Exception as e:
+                raise PipelineError(index, e, self._wrap(results)) from e
+            results.append(result)
+
+        return results
+
+    def _wrap(self, results: list[Any]) -> list[Any]:
+        return [
+            Cursor(self._conn, r) if isinstance(r, sqlite3.Cursor) else r
+            for r in results
+        ]
+
+    async def run(self) -> list[Any]:
+        """Run all recorded operations, and return their results in order."""
+        if self.results is not None:
+            raise ValueError("Pipeline already run")
+
+        ops, self._ops = self._ops, []
+        results = await self._conn._execute(self._conn._track, None, self._run_ops, ops)
+        self.results = self._wrap(results)
+        return self.results
+
+    async def __aenter__(self) -> "Pipeline":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None and self.results is None:
+            await self.run()
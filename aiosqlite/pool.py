@@ -0,0 +1,394 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Connection pool with a single writer and multiple readers
+"""
+
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Generator, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from .context import contextmanager
+from .core import connect, Connection
+from .cursor import Cursor
+
+__all__ = ["create_pool", "Pool", "PoolStats"]
+
+LOG = logging.getLogger("aiosqlite")
+
+_READ_KEYWORDS = frozenset({"SELECT", "VALUES", "EXPLAIN"})
+_FIRST_KEYWORD = re.compile(r"^[\s(]*(\w+)")
+
+
+def is_read_statement(sql: str) -> bool:
+    """
+    Guess whether the given statement only reads from the database.
+
+    Anything that isn't obviously a query (including ``WITH`` and ``PRAGMA``
+    statements, which may modify the database) is treated as a write.
+    """
+    match = _FIRST_KEYWORD.match(sql)
+    return match is not None and match.group(1).upper() in _READ_KEYWORDS
+
+
+@dataclass
+class PoolStats:
+    """
+    Snapshot of pool sizing, and acquisition metrics for readers and the writer.
+    """
+
+    min_size: int
+    max_size: int
+    size: int
+    idle: int
+    acquisitions: int
+    waits: int
+    wait_time: float
+    max_wait_time: float
+    write_acquisitions: int
+    write_waits: int
+    write_wait_time: float
+    max_write_wait_time: float
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.wait_time / self.acquisitions if self.acquisitions else 0.0
+
+    @property
+    def mean_write_wait_time(self) -> float:
+        if not self.write_acquisitions:
+            return 0.0
+        return self.write_wait_time / self.write_acquisitions
+
+
+class Pool:
+    """
+    Pool of connections to a single database file in WAL mode.
+
+    All writes go through one shared writer connection, while reads are spread
+    across up to ``max_size`` reader connections that are opened on demand.
+    At least ``min_size`` readers are kept open; extra readers are closed once
+    they have been idle for longer than ``idle_timeout`` seconds.
+
+    Other keyword arguments are passed to :func:`connect` for each connection.
+    As every connection opens the same file, they should not share a
+    :class:`SharedExecutor`, where calls waiting for a lock can occupy the
+    threads needed to release it.
+    """
+
+    def __init__(
+        self,
+        database: Union[str, Path],
+        *,
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 60.0,
+        iter_chunk_size: int = 64,
+        **kwargs: Any,
+    ) -> None:
+        if str(database) == ":memory:":
+            raise ValueError("connection pools require a database file")
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("pool sizes must satisfy 0 <= min_size <= max_size")
+
+        self._database = database
+        self._min_size = min_size
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._iter_chunk_size = iter_chunk_size
+        self._kwargs = kwargs
+
+        self._writer: Optional[Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._reader_slots: Optional[asyncio.Semaphore] = None
+        self._idle: deque[tuple[Connection, float]] = deque()
+        self._pruner: Optional[asyncio.Future] = None
+        self._size = 0
+        self._closed = False
+
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._write_acquisitions = 0
+        self._write_waits = 0
+        self._write_wait_time = 0.0
+        self._max_write_wait_time = 0.0
+
+    def _connect(self) -> Connection:
+        return connect(
+            self._database, iter_chunk_size=self._iter_chunk_size, **self._kwargs
+        )
+
+    async def _open_reader(self) -> Connection:
+        conn = await self._connect()
+        try:
+            await conn.execute("PRAGMA query_only = ON")
+        except BaseException:
+            await conn.close()
+            raise
+        self._size += 1
+        return conn
+
+    async def _close_reader(self, conn: Connection) -> None:
+        self._size -= 1
+        await conn.close()
+
+    async def _open(self) -> "Pool":
+        if self._closed:
+            raise ValueError("Pool closed")
+        if self._writer is not None:
+            return self
+
+        self._write_lock = asyncio.Lock()
+        self._reader_slots = asyncio.Semaphore(self._max_size)
+
+        writer = await self._connect()
+        try:
+            await writer.execute("PRAGMA journal_mode = WAL")
+            for _ in range(self._min_size):
+                self._idle.append((await self._open_reader(), time.monotonic()))
+        except BaseException:
+            await writer.close()
+            await self._close_idle()
+            raise
+
+        self._writer = writer
+        return self
+
+    async def _close_idle(self) -> None:
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            await self._close_reader(conn)
+
+    async def _prune_idle(self) -> None:
+        """Close readers beyond ``min_size`` that have sat idle for too long."""
+        cutoff = time.monotonic() - self._idle_timeout
+        while self._size > self._min_size and self._idle and self._idle[0][1] <= cutoff:
+            conn, _ = self._idle.popleft()
+            LOG.debug("closing idle reader %r", conn)
+            await self._close_reader(conn)
+
+    def _schedule_prune(self) -> None:
+        """Prune idle readers once they time out, even if the pool sees no use."""
+        if self._pruner is None and self._size > self._min_size and self._idle:
+            self._pruner = asyncio.ensure_future(self._prune_later())
+
+    async def _prune_later(self) -> None:
+        try:
+            while not self._closed and self._size > self._min_size and self._idle:
+                delay = self._idle[0][1] + self._idle_timeout - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    await self._prune_idle()
+        finally:
+            self._pruner = None
+
+    def __await__(self) -> Generator[Any, None, "Pool"]:
+        return self._open().__await__()
+
+    async def __aenter__(self) -> "Pool":
+        return await self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the writer and all idle readers; busy readers close on release."""
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+        await self._close_idle()
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            await writer.close()
+
+    @property
+    def _slots(self) -> asyncio.Semaphore:
+        if self._closed or self._reader_slots is None:
+            raise ValueError("Pool closed")
+        return self._reader_slots
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[Connection]:
+        """Acquire a reader connection for exclusive use within the context."""
+        slots = self._slots
+
+        before = time.monotonic()
+        waited = slots.locked()
+        await slots.acquire()
+        elapsed = time.monotonic() - before
+
+        self._acquisitions += 1
+        self._wait_time += elapsed
+        self._max_wait_time = max(self._max_wait_time, elapsed)
+        if waited:
+            self._waits += 1
+
+        try:
+            if self._idle:
+                # most recently used reader first, so the rest can go idle
+                conn, _ = self._idle.pop()
+            else:
+                conn = await self._open_reader()
+        except BaseException:
+            slots.release()
+            raise
+
+        try:
+            yield conn
+        finally:
+            try:
+                if self._closed or not conn._running:
+                    await self._close_reader(conn)
+                else:
+                    if conn.in_transaction:
+                        await conn.rollback()
+                    self._idle.append((conn, time.monotonic()))
+                    await self._prune_idle()
+                    self._schedule_prune()
+            finally:
+                slots.release()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[Connection]:
+        """
+        Acquire the writer connection for exclusive use within the context.
+
+        Any open transaction is committed when the context exits normally,
+        or rolled back if an exception was raised or the commit fails.
+        """
+        if self._closed or self._writer is None or self._write_lock is None:
+            raise ValueError("Pool closed")
+
+        before = time.monotonic()
+        waited = self._write_lock.locked()
+        async with self._write_lock:
+            elapsed = time.monotonic() - before
+            self._write_acquisitions += 1
+            self._write_wait_time += elapsed
+            self._max_write_wait_time = max(self._max_write_wait_time, elapsed)
+            if waited:
+                self._write_waits += 1
+
+            conn = self._writer
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    await conn.rollback()
+                raise
+            else:
+                if conn.in_transaction:
+                    try:
+                        await conn.commit()
+                    except BaseException:
+                        if conn.in_transaction:
+                            await conn.rollback()
+                        raise
+
+    @contextmanager
+    async def execute(
+        self, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> Cursor:
+        """
+        Execute a single statement on a reader or the writer as appropriate.
+
+        Writes are committed immediately, after stepping through any rows they
+        return, so use :meth:`execute_fetchall` for the rows of a statement like
+        ``INSERT ... RETURNING``. The connection is returned to the pool before
+        the cursor is returned, so results should be consumed promptly.
+        """
+        if is_read_statement(sql):
+            async with self.read() as conn:
+                return await conn.execute(sql, parameters)
+
+        async with self.write() as conn:
+            cursor = await conn.execute(sql, parameters)
+            # a statement with unread rows is still in progress, and would
+            # prevent the commit
+            await cursor.fetchall()
+            return cursor
+
+    @contextmanager
+    async def execute_fetchall(
+        self, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> Iterable[sqlite3.Row]:
+        """Execute a single statement as appropriate, and return all the data."""
+        if is_read_statement(sql):
+            async with self.read() as conn:
+                return await conn.execute_fetchall(sql, parameters)
+
+        async with self.write() as conn:
+            return await conn.execute_fetchall(sql, parameters)
+
+    @contextmanager
+    async def executemany(
+        self, sql: str, parameters: Iterable[Iterable[Any]]
+    ) -> Cursor:
+        """Execute the given multiquery on the writer and commit."""
+        async with self.write() as conn:
+            return await conn.executemany(sql, parameters)
+
+    @property
+    def min_size(self) -> int:
+        return self._min_size
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def idle_timeout(self) -> float:
+        return self._idle_timeout
+
+    def stats(self) -> PoolStats:
+        """Return current pool size, and reader and writer acquisition metrics."""
+        return PoolStats(
+            min_size=self._min_size,
+            max_size=self._max_size,
+            size=self._size,
+            idle=len(self._idle),
+            acquisitions=self._acquisitions,
+            waits=self._waits,
+            wait_time=self._wait_time,
+            max_wait_time=self._max_wait_time,
+            write_acquisitions=self._write_acquisitions,
+            write_waits=self._write_waits,
+            write_wait_time=self._write_wait_time,
+            max_write_wait_time=self._max_write_wait_time,
+        )
+
+
+def create_pool(
+    database: Union[str, Path],
+    *,
+    min_size: int = 1,
+    max_size: int = 4,
+    idle_timeout: float = 60.0,
+    iter_chunk_size: int = 64,
+    **kwargs: Any,
+) -> Pool:
+    """Create and return a connection pool for the sqlite database file."""
+    return Pool(
+        database,
+        min_size=min_size,
+        max_size=max_size,
+        idle_timeout=idle_timeout,
+        iter_chunk_size=iter_chunk_size,
+        **kwargs,
+    )
@@ -0,0 +1,115 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Named performance profiles, and PRAGMA settings applied when connecting
+"""
+
+import re
+import sqlite3
+from collections.abc import Mapping
+from typing import Any, Literal, Optional, Union
+
+__all__ = ["PROFILES"]
+
+#: Names of the profiles accepted by :func:`aiosqlite.connect`.
+Profile = Literal["read_heavy", "write_heavy", "bulk_load", "ephemeral"]
+PragmaValue = Union[bool, int, str]
+
+# busy_timeout comes first, so later settings wait for locks rather than failing
+#: Pragmas set by each profile, in the order they are applied when connecting.
+PROFILES: dict[str, dict[str, PragmaValue]] = {
+    # many concurrent readers: WAL, a large page cache, and memory mapped reads
+    "read_heavy": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    # frequent small transactions: WAL, with fewer checkpoints
+    "write_heavy": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32768,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 4000,
+    },
+    # loading large amounts of data, trading durability for speed
+    "bulk_load": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+    },
+    # scratch databases that don't need to survive a crash
+    "ephemeral": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+    },
+}
+
+_NAME = re.compile(r"^(\w+\.)?\w+$")
+_VALUE = re.compile(r"^-?\w+$")
+
+
+def format_value(value: PragmaValue) -> str:
+    if isinstance(value, bool):
+        return "ON" if value else "OFF"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str) and _VALUE.match(value):
+        return value
+    raise ValueError(f"invalid pragma value {value!r}")
+
+
+def pragma_settings(
+    profile: Optional[str],
+    pragmas: Optional[Mapping[str, PragmaValue]],
+    *,
+    busy_timeout: bool = True,
+) -> dict[str, PragmaValue]:
+    """
+    Merge the settings of a named profile with custom pragmas, which take
+    precedence, validating both. Without ``busy_timeout``, the profile's busy
+    timeout is left out, to keep one given to :func:`sqlite3.connect`.
+    """
+    settings: dict[str, PragmaValue] = {}
+    if profile is not None:
+        if profile not in PROFILES:
+            raise ValueError(
+                f"unknown profile {profile!r}, expected one of {', '.join(PROFILES)}"
+            )
+        settings.update(PROFILES[profile])
+        if not busy_timeout:
+            settings.pop("busy_timeout", None)
+
+    for name, value in (pragmas or {}).items():
+        if not _NAME.match(name):
+            raise ValueError(f"invalid pragma name {name!r}")
+        format_value(value)
+        settings[name] = value
+    return settings
+
+
+def apply_pragmas(
+    conn: sqlite3.Connection, settings: Mapping[str, PragmaValue]
+) -> dict[str, Any]:
+    """
+    Apply pragma settings in order, then read back the effective value of each,
+    which may differ from the value requested, like ``journal_mode`` for
+    in-memory databases.
+    """
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {format_value(value)}").fetchall()
+
+    effective = {}
+    for name in settings:
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        effective[name] = row[0] if row is not None else None
+    return effective
@@ -0,0 +1,281 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Route statements by shard key across several database files
+"""
+
+import asyncio
+import heapq
+import sqlite3
+import zlib
+from bisect import bisect_right
+from collections.abc import AsyncIterator, Generator, Iterable, Sequence
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from .context import contextmanager
+from .core import connect, Connection
+from .cursor import Cursor
+
+__all__ = ["ShardedDatabase"]
+
+# rows buffered from each shard while a scatter query waits for its consumer
+SCATTER_BUFFER = 256
+
+_DONE = object()
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def hash_shard(key: Any, shards: int) -> int:
+    """
+    Pick a shard from a stable hash of the key, which is the same across
+    processes. Keys other than bytes are hashed by their string form.
+    """
+    data = key if isinstance(key, bytes) else str(key).encode("utf-8")
+    return zlib.crc32(data) % shards
+
+
+class ShardedDatabase:
+    """
+    Spread data across several database files, each with its own connection,
+    to scale writes beyond a single SQLite writer.
+
+    Each statement runs on the shard chosen by its shard key: with
+    ``boundaries``, shard ``i`` holds keys from ``boundaries[i - 1]`` up to but
+    excluding ``boundaries[i]`` (range partitioning); otherwise keys are spread
+    by a stable hash (hash partitioning). Queries over every shard can be run
+    concurrently with :meth:`scatter`. Other keyword arguments are passed to
+    :func:`connect` for each shard. As each shard is a separate file, the shards
+    can share a :class:`SharedExecutor` passed as ``executor``.
+
+    Example::
+
+        async with ShardedDatabase(["users-0.db", "users-1.db"]) as db:
+            await db.execute(user_id, "INSERT INTO users VALUES (?, ?)", [user_id, name])
+            await db.commit()
+            async for row in db.scatter("SELECT * FROM users WHERE active"):
+                ...
+
+    """
+
+    def __init__(
+        self,
+        databases: Sequence[Union[str, Path]],
+        *,
+        boundaries: Optional[Sequence[Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        if not databases:
+            raise ValueError("sharded databases need at least one shard")
+        if boundaries is not None:
+            if len(boundaries) != len(databases) - 1:
+                raise ValueError("range partitioning needs one boundary per shard - 1")
+            if any(
+                boundaries[i] >= boundaries[i + 1] for i in range(len(boundaries) - 1)
+            ):
+                raise ValueError("range boundaries must be strictly increasing")
+
+        self._databases = list(databases)
+        self._boundaries = list(boundaries) if boundaries is not None else None
+        self._kwargs = kwargs
+        self._shards: Optional[list[Connection]] = None
+
+    async def _open(self) -> "ShardedDatabase":
+        if self._shards is not None:
+            return self
+
+        results = await asyncio.gather(
+            *(connect(database, **self._kwargs) for database in self._databases),
+            return_exceptions=True,
+        )
+        shards = [result for result in results if isinstance(result, Connection)]
+        for result in results:
+            if isinstance(result, BaseException):
+                await asyncio.gather(*(shard.close() for shard in shards))
+                raise result
+
+        self._shards = shards
+        return self
+
+    def __await__(self) -> Generator[Any, None, "ShardedDatabase"]:
+        return self._open().__await__()
+
+    async def __aenter__(self) -> "ShardedDatabase":
+        return await self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self._databases)
+
+    async def close(self) -> None:
+        """Close the connections to every shard."""
+        if self._shards is None:
+            return
+
+        shards, self._shards = self._shards, None
+        await asyncio.gather(*(shard.close() for shard in shards))
+
+    @property
+    def shards(self) -> list[Connection]:
+        """Connections to each shard, in order."""
+        if self._shards is None:
+            raise ValueError("no active connections")
+        return list(self._shards)
+
+    def shard_for(self, key: Any) -> int:
+        """Return the index of the shard holding the given key."""
+        if self._boundaries is not None:
+            return bisect_right(self._boundaries, key)
+        return hash_shard(key, len(self._databases))
+
+    def connection(self, key: Any) -> Connection:
+        """Return the connection to the shard holding the given key."""
+        return self.shards[self.shard_for(key)]
+
+    @contextmanager
+    async def execute(
+        self, key: Any, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> Cursor:
+        """Execute the given query on the shard holding the given key."""
+        return await self.connection(key).execute(sql, parameters)
+
+    @contextmanager
+    async def execute_fetchall(
+        self, key: Any, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> Iterable[sqlite3.Row]:
+        """Execute a query on the shard holding the key, and return all the data."""
+        return await self.connection(key).execute_fetchall(sql, parameters)
+
+    @contextmanager
+    async def executemany(
+        self, key: Any, sql: str, parameters: Iterable[Iterable[Any]]
+    ) -> Cursor:
+        """Execute the given multiquery on the shard holding the given key."""
+        return await self.connection(key).executemany(sql, parameters)
+
+    async def execute_all(
+        self, sql: str, parameters: Optional[Iterable[Any]] = None
+    ) -> None:
+        """Execute a statement, like a schema change, on every shard concurrently."""
+        if parameters is not None:
+            parameters = list(parameters)
+        await asyncio.gather(*(shard.execute(sql, parameters) for shard in self.shards))
+
+    async def commit(self) -> None:
+        """Commit the current transaction on every shard."""
+        await asyncio.gather(*(shard.commit() for shard in self.shards))
+
+    async def rollback(self) -> None:
+        """Roll back the current transaction on every shard."""
+        await asyncio.gather(*(shard.rollback() for shard in self.shards))
+
+    async def scatter(
+        self,
+        sql: str,
+        parameters: Optional[Iterable[Any]] = None,
+        *,
+        key: Optional[Callable[[Any], Any]] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Run a query on every shard concurrently, and yield rows as they arrive.
+
+        Rows from different shards are interleaved in no particular order.
+        If every shard returns rows sorted by ``key``, passing ``key`` merges
+        them in that order instead. Each shard buffers a bounded number of rows
+        ahead of the consumer, and stopping early cancels the remaining work.
+        """
+        if parameters is not None:
+            parameters = list(parameters)
+        if key is not None:
+            merged = self._scatter_sorted(sql, parameters, key)
+            try:
+                async for row in merged:
+                    yield row
+            finally:
+                await merged.aclose()  # type: ignore[attr-defined]
+            return
+
+        queue: asyncio.Queue[Any] = asyncio.Queue(SCATTER_BUFFER)
+
+        async def fetch(shard: Connection) -> None:
+            try:
+                async with shard.execute(sql, parameters) as cursor:
+                    async for row in cursor:
+                        await queue.put(row)
+            except Exception as e:
+                await queue.put(_Failure(e))
+            else:
+                await queue.put(_DONE)
+
+        tasks = [asyncio.ensure_future(fetch(shard)) for shard in self.shards]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                row = await queue.get()
+                if row is _DONE:
+                    remaining -= 1
+                elif isinstance(row, _Failure):
+                    raise row.error
+                else:
+                    yield row
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _scatter_sorted(
+        self,
+        sql: str,
+        parameters: Optional[list[Any]],
+        key: Callable[[Any], Any],
+    ) -> AsyncIterator[Any]:
+        """Merge sorted results from every shard, fetching from each in chunks."""
+        results = await asyncio.gather(
+            *(shard.execute(sql, parameters) for shard in self.shards),
+            return_exceptions=True,
+        )
+        cursors = [result for result in results if isinstance(result, Cursor)]
+        for result in results:
+            if isinstance(result, BaseException):
+                await asyncio.gather(*(cursor.close() for cursor in cursors))
+                raise result
+
+        iterators = [cursor.__aiter__() for cursor in cursors]
+        try:
+            heads = await asyncio.gather(
+                *(anext_or_done(iterator) for iterator in iterators)
+            )
+            heap = [
+                (key(row), index, row)
+                for index, row in enumerate(heads)
+                if row is not _DONE
+            ]
+            heapq.heapify(heap)
+            while heap:
+                _, index, row = heap[0]
+                yield row
+                row = await anext_or_done(iterators[index])
+                if row is _DONE:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (key(row), index, row))
+        finally:
+            for iterator in iterators:
+                await iterator.aclose()  # type: ignore[attr-defined]
+            await asyncio.gather(*(cursor.close() for cursor in cursors))
+
+
+async def anext_or_done(iterator: AsyncIterator[Any]) -> Any:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _DONE
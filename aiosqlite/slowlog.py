@@ -0,0 +1,172 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Logging of slow statements, along with their query plans
+"""
+
+import logging
+import sqlite3
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+__all__ = ["SlowQuery"]
+
+LOG = logging.getLogger("aiosqlite")
+
+
+@dataclass
+class SlowQuery:
+    """
+    A statement that took longer than the connection's slow query threshold.
+
+    ``parameters`` describes the shape of the bound parameters rather than their
+    values, and ``rows`` is the number of rows returned or modified, if known
+    when the statement completed. For a cursor, ``duration`` only covers
+    stepping to its first row, and rows fetched later are not counted. ``plan``
+    holds the indented lines of its ``EXPLAIN QUERY PLAN``, and ``full_scans``
+    the tables it reads without an index.
+    """
+
+    sql: str
+    parameters: str
+    duration: float
+    rows: Optional[int]
+    plan: list[str]
+    full_scans: list[str]
+
+    @property
+    def full_scan(self) -> bool:
+        return bool(self.full_scans)
+
+
+def parameter_shape(parameters: Any, many: bool = False) -> str:
+    """
+    Describe parameters without including their values.
+
+    :meta private:
+    """
+    if many:
+        if isinstance(parameters, Sequence):
+            first = parameter_shape(parameters[0]) if parameters else "()"
+            return f"{len(parameters)} x {first}"
+        return f"iterable of {type(parameters).__name__}"
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, Mapping):
+        return "{" + ", ".join(f":{key}" for key in parameters) + "}"
+    if isinstance(parameters, Sequence):
+        return f"({len(parameters)})"
+    return type(parameters).__name__
+
+
+def result_rows(result: Any) -> Optional[int]:
+    """
+    Count the rows returned or modified by a statement, given its result.
+
+    :meta private:
+    """
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return len(next(iter(result.values())).values) if result else 0
+    if isinstance(result, sqlite3.Cursor) and result.rowcount >= 0:
+        return result.rowcount
+    return None
+
+
+def query_plan(
+    conn: sqlite3.Connection, sql: str, parameters: Any
+) -> tuple[list[str], list[str]]:
+    """
+    Return the indented lines of a statement's query plan, and the tables that
+    the plan scans in full. Must run on the connection thread.
+
+    :meta private:
+    """
+    # plan rows are unpacked as tuples, whatever the connection's row factory
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        LOG.debug("unable to explain query plan: %r", e)
+        return [], []
+    finally:
+        cursor.close()
+
+    depths: dict[int, int] = {}
+    plan: list[str] = []
+    scans: list[str] = []
+    for node, parent, _, detail in rows:
+        depth = depths[node] = depths.get(parent, -1) + 1
+        plan.append("  " * depth + detail)
+
+        # "SCAN foo" in current releases, "SCAN TABLE foo" in older ones, while
+        # scans of indexes or subqueries are cheaper and not flagged
+        words = detail.split()
+        if words[0] == "SCAN" and "USING" not in words and len(words) > 1:
+            table = words[2] if words[1] == "TABLE" and len(words) > 2 else words[1]
+            if table not in ("CONSTANT", "SUBQUERY") and not table.startswith("("):
+                scans.append(table)
+
+    return plan, scans
+
+
+class SlowQueryLog:
+    """
+    Check statement durations against a threshold, and report slow ones to the
+    ``aiosqlite`` logger and an optional callback.
+
+    :meta private:
+    """
+
+    def __init__(
+        self, threshold: float, callback: Optional[Callable[[SlowQuery], None]]
+    ) -> None:
+        self.threshold = threshold
+        self.callback = callback
+
+    def observe(
+        self,
+        conn: sqlite3.Connection,
+        sql: str,
+        parameters: Any,
+        many: bool,
+        duration: float,
+        result: Any,
+    ) -> None:
+        if duration < self.threshold:
+            return
+
+        # explain executemany statements using their first set of parameters
+        if many:
+            explain_params = (
+                parameters[0] if isinstance(parameters, Sequence) and parameters else ()
+            )
+        else:
+            explain_params = () if parameters is None else parameters
+        plan, scans = query_plan(conn, sql, explain_params)
+
+        query = SlowQuery(
+            sql=sql,
+            parameters=parameter_shape(parameters, many),
+            duration=duration,
+            rows=result_rows(result),
+            plan=plan,
+            full_scans=scans,
+        )
+        LOG.warning(
+            "slow query (%.3fs, %s rows, parameters %s%s): %s%s",
+            query.duration,
+            "unknown" if query.rows is None else query.rows,
+            query.parameters,
+            ", full scan of " + ", ".join(scans) if scans else "",
+            query.sql,
+            "".join("\n" + line for line in plan),
+        )
+        if self.callback is not None:
+            self.callback(query)
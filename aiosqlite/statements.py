@@ -0,0 +1,131 @@
+# Copyright Amethyst Reese
+# Licensed under the MIT license
+
+"""
+Aggregated execution statistics for normalized statements
+"""
+
+import re
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Optional
+
+__all__ = ["StatementStats", "normalize_sql"]
+
+# upper bound on the number of raw statements whose normalized form is remembered
+_MAX_NORMALIZED = 4096
+
+_TOKENS = re.compile(
+    r"""
+    (?P<identifier>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    | (?P<string>[xX]?'(?:[^']|'')*')
+    | (?P<number>\b(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)\b)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+    | (?P<space>\s+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_PLACEHOLDER_LIST = re.compile(r"\(\?(?: ?, ?\?)+\)")
+_PLACEHOLDER_ROWS = re.compile(r"\(\?, \.\.\.\)(?: ?, ?\(\?, \.\.\.\))+")
+
+
+def _normalize_token(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "identifier":
+        return match.group()
+    if kind in ("string", "number"):
+        return "?"
+    return " "
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize a statement so that queries differing only in literal values,
+    whitespace, comments, or the length of ``IN`` lists and ``VALUES`` rows are
+    aggregated together.
+
+    Literals are replaced with ``?``, lists of placeholders are collapsed to
+    ``(?, ...)``, and repeated rows of them to ``(?, ...), ...``.
+    """
+    normalized = _TOKENS.sub(_normalize_token, sql)
+    normalized = " ".join(normalized.split())
+    normalized = normalized.replace("( ", "(").replace(" )", ")").replace(" ,", ",")
+    normalized = _PLACEHOLDER_LIST.sub("(?, ...)", normalized)
+    normalized = _PLACEHOLDER_ROWS.sub("(?, ...), ...", normalized)
+    return normalized
+
+
+@dataclass
+class StatementStats:
+    """
+    Execution statistics for one normalized statement.
+
+    Times are in seconds, and cover executing the statement on the connection
+    thread, including fetching rows for helpers like
+    :meth:`Connection.execute_fetchall`, but not rows fetched later through a
+    cursor. ``rows`` counts rows returned or modified when that is known as
+    the statement completes.
+
+    Statements are recorded when run through the execute methods of
+    connections, cursors, and pipelines. Statements run by
+    :meth:`Connection.executescript`, or by functions passed to
+    :meth:`Connection.run` or :meth:`Connection.transaction_sync`, are not.
+    """
+
+    sql: str
+    calls: int = 0
+    errors: int = 0
+    rows: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class StatementRegistry:
+    """
+    Per-connection registry of statement statistics. Updated from the connection
+    thread, and read from the event loop.
+
+    :meta private:
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats: dict[str, StatementStats] = {}
+        self._normalized: dict[str, str] = {}
+
+    def record(
+        self, sql: str, duration: float, rows: Optional[int], error: bool = False
+    ) -> None:
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            normalized = normalize_sql(sql)
+            if len(self._normalized) >= _MAX_NORMALIZED:
+                self._normalized.clear()
+            self._normalized[sql] = normalized
+
+        with self._lock:
+            stats = self._stats.get(normalized)
+            if stats is None:
+                stats = self._stats[normalized] = StatementStats(normalized)
+            stats.calls += 1
+            stats.total_time += duration
+            if duration > stats.max_time:
+                stats.max_time = duration
+            if error:
+                stats.errors += 1
+            elif rows is not None:
+                stats.rows += rows
+
+    def snapshot(self) -> list[StatementStats]:
+        """Return copies of all statistics, by descending total time."""
+        with self._lock:
+            stats = [replace(s) for s in self._stats.values()]
+        return sorted(stats, key=lambda s: s.total_time, reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
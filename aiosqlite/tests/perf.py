@@ -4,6 +4,7 @@
 """
 Simple perf tests for aiosqlite and the asyncio run loop.
 """
+import asyncio
 import sqlite3
 import string
 import tempfile
@@ -84,6 +85,14 @@ class PerfTest(TestCase):
             async with aiosqlite.connect(TEST_DB):
                 pass
 
+    @timed
+    async def test_connection_memory_shared(self):
+        with aiosqlite.SharedExecutor(1) as executor:
+            while True:
+                yield
+                async with aiosqlite.connect(TEST_DB, executor=executor):
+                    pass
+
     @timed
     async def test_connection_file(self):
         with tempfile.NamedTemporaryFile(delete=False) as tf:
@@ -114,6 +123,22 @@ class PerfTest(TestCase):
                 async with db.execute("select last_insert_rowid()") as cursor:
                     await cursor.fetchone()
 
+    @timed
+    async def test_atomics_gathered(self):
+        async with aiosqlite.connect(TEST_DB) as db:
+            await db.execute("create table perf (i integer primary key asc, k integer)")
+            await db.execute("insert into perf (k) values (2), (3)")
+            await db.commit()
+
+            while True:
+                yield
+                await asyncio.gather(
+                    *[
+                        db.execute_fetchall("select last_insert_rowid()")
+                        for _ in range(10)
+                    ]
+                )
+
     @timed
     async def test_inserts(self):
         async with aiosqlite.connect(TEST_DB) as db:
@@ -142,6 +167,29 @@ class PerfTest(TestCase):
                 await db.execute("insert into perf (k) values (1), (2), (3)")
                 await db.commit()
 
+    @timed
+    async def test_inserts_executemany(self):
+        async with aiosqlite.connect(TEST_DB) as db:
+            await db.execute("create table perf (i integer primary key asc, k integer)")
+            await db.commit()
+
+            while True:
+                yield
+                await db.executemany(
+                    "insert into perf (k) values (?)", [(k,) for k in range(1000)]
+                )
+                await db.commit()
+
+    @timed
+    async def test_inserts_bulk(self):
+        async with aiosqlite.connect(TEST_DB) as db:
+            await db.execute("create table perf (i integer primary key asc, k integer)")
+            await db.commit()
+
+            while True:
+                yield
+                await db.bulk_insert("perf", [(k,) for k in range(1000)], ["k"])
+
     @timed
     async def test_insert_ids(self):
         async with aiosqlite.connect(TEST_DB) as db:
@@ -166,6 +214,20 @@ class PerfTest(TestCase):
                 await db.execute_insert("insert into perf (k) values (1)")
                 await db.commit()
 
+    @timed
+    async def test_insert_pipelined_ids(self):
+        async with aiosqlite.connect(TEST_DB) as db:
+            await db.execute("create table perf (i integer primary key asc, k integer)")
+            await db.commit()
+
+            while True:
+                yield
+                async with db.pipeline() as pipe:
+                    pipe.execute("insert into perf (k) values (1)")
+                    pipe.execute("select last_insert_rowid()")
+                    pipe.fetchone()
+                    pipe.commit()
+
     @timed
     async def test_select(self):
         async with aiosqlite.connect(TEST_DB) as db:
@@ -219,3 +281,26 @@ class PerfTest(TestCase):
 
             for chunk_size in [2**i for i in range(4, 11)]:
                 await timed(test_perf, f"iterable_cursor @ {chunk_size}")(chunk_size)
+
+            async def test_prefetch_perf(prefetch: int):
+                while True:
+                    async with db.execute("SELECT * FROM ic_perf") as cursor:
+                        cursor.iter_chunk_size = 64
+                        cursor.iter_prefetch = prefetch
+                        async for _ in cursor:
+                            yield
+
+            async def test_adaptive_perf(target: float):
+                while True:
+                    async with db.execute("SELECT * FROM ic_perf") as cursor:
+                        cursor.iter_chunk_target = target
+                        async for _ in cursor:
+                            yield
+
+            for target in (0.001, 0.01):
+                await timed(test_adaptive_perf, f"iterable_cursor @ {target}s")(target)
+
+            for prefetch in (1, 2, 4):
+                await timed(test_prefetch_perf, f"iterable_cursor @ 64+{prefetch}")(
+                    prefetch
+                )
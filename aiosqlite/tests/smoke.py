@@ -4,10 +4,14 @@
 import asyncio
 import sqlite3
 import sys
+import time
+import warnings
+from array import array
+from dataclasses import replace
 from pathlib import Path
 from sqlite3 import OperationalError
 from tempfile import TemporaryDirectory
-from threading import Thread
+from threading import Event, Thread
 from unittest import IsolatedAsyncioTestCase, SkipTest
 from unittest.mock import patch
 
@@ -107,6 +111,31 @@ class SmokeTest(IsolatedAsyncioTestCase):
 
         assert len(rows) == 10
 
+    async def test_multiple_queries_batched_results(self):
+        async with aiosqlite.connect(self.db) as db:
+            results = await asyncio.gather(
+                *[
+                    db.execute_fetchall("select ?", [i] if i % 3 else [])
+                    for i in range(30)
+                ],
+                return_exceptions=True,
+            )
+
+        for i, result in enumerate(results):
+            if i % 3:
+                self.assertEqual(result, [(i,)])
+            else:
+                self.assertIsInstance(result, sqlite3.ProgrammingError)
+
+    async def test_batched_results_not_held_by_slow_calls(self):
+        async with aiosqlite.connect(self.db) as db:
+            before = time.monotonic()
+            fast = asyncio.ensure_future(db.execute_fetchall("select 1"))
+            slow = asyncio.ensure_future(db.run(lambda conn: time.sleep(0.5)))
+            self.assertEqual(await fast, [(1,)])
+            self.assertLess(time.monotonic() - before, 0.25)
+            await slow
+
     async def test_iterable_cursor(self):
         async with aiosqlite.connect(self.db) as db:
             cursor = await db.cursor()
@@ -126,6 +155,829 @@ class SmokeTest(IsolatedAsyncioTestCase):
 
         assert len(rows) == 10
 
+    async def test_iterable_cursor_prefetch(self):
+        async with aiosqlite.connect(self.db, iter_chunk_size=4, iter_prefetch=2) as db:
+            await db.execute("create table foo (k integer)")
+            await db.executemany("insert into foo values (?)", [[i] for i in range(19)])
+
+            async with db.execute("select k from foo order by k") as cursor:
+                self.assertEqual(cursor.iter_prefetch, 2)
+                rows = [row async for row in cursor]
+            self.assertEqual(rows, [(i,) for i in range(19)])
+
+            async with db.execute("select k from foo order by k") as cursor:
+                cursor.iter_chunk_size = 19
+                rows = [row async for row in cursor]
+            self.assertEqual(len(rows), 19)
+
+            async with db.execute("select k from foo order by k") as cursor:
+                async for row in cursor:
+                    if row == (5,):
+                        break
+
+            rows = await db.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(19,)])
+
+    async def test_iterable_cursor_adaptive(self):
+        async with aiosqlite.connect(self.db, iter_chunk_target=60.0) as db:
+            await db.execute("create table foo (k integer)")
+            await db.executemany(
+                "insert into foo values (?)", [[i] for i in range(5000)]
+            )
+
+            async with db.execute("select k from foo order by k") as cursor:
+                self.assertEqual(cursor.iter_chunk_size, 64)
+                rows = [row async for row in cursor]
+                self.assertEqual(rows, [(i,) for i in range(5000)])
+                self.assertEqual(cursor.iter_chunk_size, 4096)
+
+            async with db.execute("select k from foo order by k") as cursor:
+                cursor.iter_chunk_target = 1e-9
+                cursor.iter_prefetch = 1
+                rows = [row async for row in cursor]
+                self.assertEqual(len(rows), 5000)
+                self.assertEqual(cursor.iter_chunk_size, 16)
+
+    async def test_fetch_columns(self):
+        async with aiosqlite.connect(self.db) as db:
+            db.row_factory = aiosqlite.Row
+            await db.execute("create table foo (i integer, r real, t text, n integer)")
+            await db.executemany(
+                "insert into foo values (?, ?, ?, ?)",
+                [(1, 1.5, "a", None), (2, 2, None, 7), (3, 3.5, "c", None)],
+            )
+
+            columns = await db.execute_columns("select * from foo order by i")
+            self.assertEqual(list(columns), ["i", "r", "t", "n"])
+
+            i, r, t, n = columns.values()
+            self.assertEqual(i.values, array("q", [1, 2, 3]))
+            self.assertIsNone(i.mask)
+            self.assertEqual(r.values, array("d", [1.5, 2.0, 3.5]))
+            self.assertEqual(t.values, ["a", None, "c"])
+            self.assertEqual(t.mask, bytearray([0, 1, 0]))
+            self.assertEqual(n.values, array("q", [0, 7, 0]))
+            self.assertEqual(n.mask, bytearray([1, 0, 1]))
+
+            async with db.execute("select i, r from foo where i > ?", [1]) as cursor:
+                columns = await cursor.fetch_columns(types={"i": "i"})
+                self.assertEqual(columns["i"].values, array("i", [2, 3]))
+                self.assertEqual(columns["r"].values, array("d", [2.0, 3.5]))
+                self.assertEqual(cursor.row_factory, aiosqlite.Row)
+
+            columns = await db.execute_columns("select * from foo where i > 3")
+            self.assertEqual(columns["i"], aiosqlite.Column(array("q"), None))
+
+            with self.assertRaises(TypeError):
+                await db.execute_columns("select t from foo", types={"t": "q"})
+
+    async def test_insert_columns(self):
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute(
+                'create table "foo bar" (i integer unique, r real, t text)'
+            )
+            await db.commit()
+
+            count = await db.insert_columns(
+                "foo bar",
+                {
+                    "i": array("q", [1, 2, 3]),
+                    "r": memoryview(array("d", [1.5, 2.5, 3.5])),
+                    "t": ["a", None, "c"],
+                },
+            )
+            self.assertEqual(count, 3)
+            self.assertFalse(db.in_transaction)
+
+            columns = await db.execute_columns('select i + 3 as i, t from "foo bar"')
+            await db.insert_columns("foo bar", columns)
+            rows = await db.execute_fetchall('select i, t from "foo bar" order by i')
+            self.assertEqual(
+                rows, [(1, "a"), (2, None), (3, "c"), (4, "a"), (5, None), (6, "c")]
+            )
+
+            with self.assertRaisesRegex(ValueError, "same length"):
+                await db.insert_columns("foo bar", {"i": [1, 2], "t": ["a"]})
+            with self.assertRaises(TypeError):
+                await db.insert_columns("foo bar", {"t": "abc"})
+
+            # the whole insert is rolled back if any row fails
+            with self.assertRaises(sqlite3.IntegrityError):
+                await db.insert_columns("foo bar", {"i": array("q", [7, 8, 1])})
+            rows = await db.execute_fetchall('select count(*) from "foo bar"')
+            self.assertEqual(rows, [(6,)])
+
+    async def test_executemany_async_iterable(self):
+        async def params(count):
+            for i in range(count):
+                await asyncio.sleep(0)
+                yield (i,)
+
+        async def failing():
+            yield (1,)
+            raise RuntimeError("producer failed")
+
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute("create table foo (k integer)")
+
+            async with db.executemany(
+                "insert into foo values (?)", params(25), chunk_size=10
+            ) as cursor:
+                self.assertEqual(cursor.rowcount, 5)
+
+            rows = await db.execute_fetchall("select k from foo order by k")
+            self.assertEqual(rows, [(i,) for i in range(25)])
+
+            async with db.cursor() as cursor:
+                await cursor.executemany("insert into foo values (?)", params(0))
+                with self.assertRaisesRegex(RuntimeError, "producer failed"):
+                    await cursor.executemany("insert into foo values (?)", failing())
+
+            with self.assertRaises(OperationalError):
+                await db.executemany("insert into bar values (?)", params(3))
+
+    async def test_bulk_insert(self):
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute("create table foo (i integer primary key, k text)")
+            await db.execute("create index foo_k on foo (k)")
+            await db.commit()
+
+            result = await db.bulk_insert(
+                "foo",
+                ((i, str(i)) for i in range(2500)),
+                ["i", "k"],
+                commit_every=1000,
+                fast=True,
+                defer_indexes=True,
+            )
+            self.assertIsInstance(result, aiosqlite.BulkInsertResult)
+            self.assertEqual(result.rows, 2500)
+            self.assertGreater(result.rows_per_second, 0)
+            self.assertFalse(db.in_transaction)
+
+            rows = await db.execute_fetchall("select count(*), sum(i) from foo")
+            self.assertEqual(rows, [(2500, sum(range(2500)))])
+            rows = await db.execute_fetchall("pragma index_list(foo)")
+            self.assertEqual([row[1] for row in rows], ["foo_k"])
+            rows = await db.execute_fetchall("pragma synchronous")
+            self.assertEqual(rows, [(2,)])
+
+            # batches before the failing one stay committed
+            with self.assertRaises(sqlite3.IntegrityError):
+                await db.bulk_insert(
+                    "foo", [(3000,), (3001,), (0,)], ["i"], commit_every=2
+                )
+            rows = await db.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(2502,)])
+
+            with self.assertRaisesRegex(ValueError, "expected 2 values"):
+                await db.bulk_insert("foo", [(1,)], ["i", "k"])
+
+            # unique indexes keep enforcing their constraints
+            await db.execute("create table bar (i integer)")
+            await db.execute("create unique index bar_i on bar (i)")
+            await db.commit()
+            with self.assertRaises(sqlite3.IntegrityError):
+                await db.bulk_insert("bar", [(1,), (1,)], ["i"], defer_indexes=True)
+            rows = await db.execute_fetchall("select count(*) from bar")
+            self.assertEqual(rows, [(0,)])
+            rows = await db.execute_fetchall("pragma index_list(bar)")
+            self.assertEqual([row[1] for row in rows], ["bar_i"])
+
+    async def test_bulk_insert_interleaved(self):
+        db = await aiosqlite.connect(self.db)
+        await db.execute("create table foo (i integer)")
+        await db.execute("create index foo_i on foo (i)")
+        await db.execute("create table bar (i integer)")
+        await db.commit()
+
+        def load():
+            return asyncio.ensure_future(
+                db.bulk_insert(
+                    "foo",
+                    ((i,) for i in range(20000)),
+                    ["i"],
+                    commit_every=100,
+                    defer_indexes=True,
+                )
+            )
+
+        # a write queued during the load runs after it, so rolling it back
+        # leaves every batch in place
+        loading = load()
+        await asyncio.sleep(0)
+        await db.execute("insert into bar values (1)")
+        self.assertTrue(loading.done())
+        await db.rollback()
+        self.assertEqual((await loading).rows, 20000)
+        rows = await db.execute_fetchall("select count(*) from foo")
+        self.assertEqual(rows, [(20000,)])
+        rows = await db.execute_fetchall("pragma index_list(foo)")
+        self.assertEqual([row[1] for row in rows], ["foo_i"])
+
+        # cancelling the load only rolls back the current batch, and still
+        # rebuilds deferred indexes
+        await db.execute("delete from foo")
+        await db.commit()
+        loading = load()
+        await asyncio.sleep(0.02)
+        loading.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await loading
+        ((loaded,),) = await db.execute_fetchall("select count(*) from foo")
+        self.assertEqual(loaded % 100, 0)
+        rows = await db.execute_fetchall("pragma index_list(foo)")
+        self.assertEqual([row[1] for row in rows], ["foo_i"])
+        self.assertFalse(db.in_transaction)
+
+        # closing waits for the load to finish
+        await db.execute("delete from foo")
+        await db.commit()
+        loading = load()
+        await asyncio.sleep(0)
+        await db.close()
+        self.assertEqual((await loading).rows, 20000)
+
+        async with aiosqlite.connect(self.db) as db:
+            rows = await db.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(20000,)])
+            rows = await db.execute_fetchall("pragma index_list(foo)")
+            self.assertEqual([row[1] for row in rows], ["foo_i"])
+
+    async def test_result_cache(self):
+        async with aiosqlite.connect(self.db) as db:
+            self.assertIsNone(db.cache_stats())
+
+        async with aiosqlite.connect(self.db, result_cache_size=2) as db:
+            await db.executescript(
+                "create table foo (k integer); create table bar (k integer);"
+                "create view baz as select k from foo;"
+                "insert into foo values (1);"
+            )
+            query = "select k from foo where k > ?"
+            self.assertEqual(await db.execute_fetchall(query, [0]), [(1,)])
+            self.assertEqual(await db.execute_fetchall(query, [0]), [(1,)])
+            stats = db.cache_stats()
+            self.assertEqual((stats.size, stats.hits, stats.misses), (1, 1, 1))
+
+            # writes to unrelated tables keep results, writes to read tables don't
+            await db.execute("insert into bar values (2)")
+            await db.execute_fetchall(query, [0])
+            self.assertEqual(db.cache_stats().hits, 2)
+            await db.execute("insert into foo values (3)")
+            self.assertEqual(await db.execute_fetchall(query, [0]), [(1,), (3,)])
+            self.assertEqual(db.cache_stats().invalidations, 1)
+
+            # views are invalidated by the tables they read from
+            self.assertEqual(
+                await db.execute_fetchall("select * from baz"), [(1,), (3,)]
+            )
+            cursor = await db.cursor()
+            await cursor.execute("delete from foo where k = ?", [1])
+            self.assertEqual(await db.execute_fetchall("select * from baz"), [(3,)])
+
+            # least recently used results are evicted past the maximum size
+            await db.execute_fetchall("select k from bar")
+            await db.execute_fetchall(query, [1])
+            stats = db.cache_stats()
+            self.assertEqual((stats.size, stats.evictions), (2, 1))
+
+            await db.executescript("select 1")
+            self.assertEqual(db.cache_stats().size, 0)
+
+            # schema changes invalidate every result, and the tables written by
+            # statements seen before, like an insert that now fires a trigger
+            await db.execute_fetchall("select k from bar")
+            await db.execute("drop table foo")
+            self.assertEqual(db.cache_stats().size, 0)
+            await db.execute("create table foo (k integer)")
+            self.assertEqual(await db.execute_fetchall(query, [0]), [])
+            await db.execute(
+                "create trigger bar_foo after insert on bar "
+                "begin insert into foo values (new.k); end"
+            )
+            self.assertEqual(await db.execute_fetchall(query, [0]), [])
+            await db.execute("insert into bar values (2)")
+            self.assertEqual(await db.execute_fetchall(query, [0]), [(2,)])
+
+        async with aiosqlite.connect(
+            self.db, result_cache_size=8, result_cache_ttl=0.01
+        ) as db:
+            await db.execute_fetchall("select k from bar")
+            await asyncio.sleep(0.02)
+            await db.execute_fetchall("select k from bar")
+            stats = db.cache_stats()
+            self.assertEqual((stats.hits, stats.misses, stats.evictions), (0, 2, 1))
+
+        # statements that write, or may have side effects, are never cached
+        async with aiosqlite.connect(self.db, result_cache_size=8) as db:
+            insert = "insert into bar values (?) returning k"
+            self.assertEqual(await db.execute_fetchall(insert, [5]), [(5,)])
+            self.assertEqual(await db.execute_fetchall(insert, [5]), [(5,)])
+            insert = "with x as (select ?) insert into bar select * from x returning k"
+            self.assertEqual(await db.execute_fetchall(insert, [6]), [(6,)])
+            self.assertEqual(await db.execute_fetchall(insert, [6]), [(6,)])
+            await db.execute_fetchall("pragma user_version = 3")
+            self.assertEqual(await db.execute_fetchall("pragma user_version"), [(3,)])
+            await db.execute_fetchall("pragma user_version = 4")
+            self.assertEqual(await db.execute_fetchall("pragma user_version"), [(4,)])
+            self.assertEqual(db.cache_stats().size, 0)
+            self.assertEqual(
+                await db.execute_fetchall("select count(*) from bar where k > 4"),
+                [(4,)],
+            )
+
+    async def test_latency_stats(self):
+        async with aiosqlite.connect(self.db) as db:
+            self.assertIsNone(db.latency_stats())
+
+        timings = []
+        async with aiosqlite.connect(
+            self.db, record_latency=True, latency_callback=timings.append
+        ) as db:
+            started, gate = Event(), Event()
+            blocked = db._submit(lambda: started.set() or gate.wait())
+            started.wait()
+            queries = [
+                asyncio.ensure_future(db.execute_fetchall("select ?", [i]))
+                for i in range(5)
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(db.latency_stats().queue_depth, 5)
+
+            await asyncio.sleep(0.01)
+            gate.set()
+            await blocked
+            await asyncio.gather(*queries)
+
+            stats = db.latency_stats()
+            self.assertEqual(stats.queue_depth, 0)
+            self.assertEqual(stats.execute_time.count, 6)
+            self.assertGreaterEqual(stats.execute_time.max, 0.01)
+            self.assertGreaterEqual(stats.queue_wait.percentile(50), 0.01)
+            self.assertGreater(stats.delivery_lag.count, 0)
+
+            self.assertEqual(len(timings), 6)
+            depths = sorted(t.queue_depth for t in timings)
+            self.assertEqual(depths, [0, 0, 1, 2, 3, 4])
+            for timing in timings:
+                self.assertLessEqual(timing.enqueued, timing.started)
+                self.assertLessEqual(timing.started, timing.finished)
+                self.assertLessEqual(timing.finished, timing.resolved)
+
+            db.reset_latency_stats()
+            self.assertEqual(db.latency_stats().execute_time.count, 0)
+
+    async def test_priority(self):
+        async with aiosqlite.connect(":memory:") as db:
+
+            async def run_in_order(priorities):
+                order = []
+                started, gate = Event(), Event()
+                blocked = db._submit(lambda: started.set() or gate.wait())
+                started.wait()
+                calls = [
+                    asyncio.ensure_future(
+                        db.run(lambda conn, p=p: order.append(p), priority=p)
+                    )
+                    for p in priorities
+                ]
+                await asyncio.sleep(0)
+                gate.set()
+                await asyncio.gather(blocked, *calls)
+                return order
+
+            order = await run_in_order(["bulk", "normal", "interactive", "normal"])
+            self.assertEqual(order, ["interactive", "normal", "normal", "bulk"])
+
+            # lower priority calls are passed over a limited number of times
+            order = await run_in_order(["bulk"] + ["interactive"] * 20)
+            self.assertEqual(order.index("bulk"), aiosqlite.core.STARVATION_LIMIT)
+
+            async with db.execute("select 1", priority="interactive") as cursor:
+                self.assertEqual(cursor.priority, "interactive")
+                self.assertEqual(await cursor.fetchall(), [(1,)])
+                await cursor.execute("select 2", priority="bulk")
+                self.assertEqual(cursor.priority, "bulk")
+
+            with self.assertRaisesRegex(ValueError, "unknown priority"):
+                await db.execute_fetchall("select 1", priority="urgent")
+
+    async def test_query_timeout(self):
+        forever = (
+            "with recursive c(x) as (select 1 union all select x + 1 from c) "
+            "select count(*) from c"
+        )
+        async with aiosqlite.connect(self.db) as db:
+            calls = []
+            await db.set_progress_handler(lambda: calls.append(1), 1)
+
+            before = time.monotonic()
+            with self.assertRaises(aiosqlite.QueryTimeoutError) as context:
+                await db.execute_fetchall(forever, timeout=0.05)
+            self.assertLess(time.monotonic() - before, 1)
+            self.assertIsInstance(context.exception, aiosqlite.OperationalError)
+            self.assertIsInstance(context.exception, TimeoutError)
+            self.assertEqual(context.exception.timeout, 0.05)
+            # the user's progress handler is chained, then restored
+            self.assertTrue(calls)
+            calls.clear()
+            self.assertEqual(await db.execute_fetchall("select 1"), [(1,)])
+            self.assertTrue(calls)
+            await db.set_progress_handler(None, 1)
+
+            # time spent waiting in the queue counts towards the timeout
+            started, gate = Event(), Event()
+            blocked = db._submit(lambda: started.set() or gate.wait())
+            started.wait()
+            query = asyncio.ensure_future(db.execute_fetchall("select 1", timeout=0.01))
+            await asyncio.sleep(0.05)
+            gate.set()
+            await blocked
+            with self.assertRaises(aiosqlite.QueryTimeoutError):
+                await query
+
+            # the first row is found immediately, but never a second one
+            sparse = forever.replace("select count(*) from c", "select x from c")
+            async with db.execute(sparse + " where x = 1 or x < 0") as cursor:
+                with self.assertRaises(aiosqlite.QueryTimeoutError):
+                    await cursor.fetchone(timeout=0.05)
+
+        async with aiosqlite.connect(self.db, query_timeout=0.05) as db:
+            with self.assertRaises(aiosqlite.QueryTimeoutError):
+                await db.execute_fetchall(forever)
+            rows = await db.execute_fetchall(
+                "select count(*) from (select 1 union all select 2)", timeout=10
+            )
+            self.assertEqual(rows, [(2,)])
+
+    async def test_profiles(self):
+        async with aiosqlite.connect(self.db) as db:
+            self.assertEqual(db.pragmas, {})
+
+        async with aiosqlite.connect(
+            self.db, profile="read_heavy", pragmas={"cache_size": -1000}
+        ) as db:
+            pragmas = db.pragmas
+            self.assertEqual(pragmas["journal_mode"], "wal")
+            self.assertEqual(pragmas["synchronous"], 1)
+            self.assertEqual(pragmas["temp_store"], 2)
+            self.assertEqual(pragmas["busy_timeout"], 5000)
+            self.assertEqual(pragmas["cache_size"], -1000)
+            self.assertEqual(await db.execute_fetchall("pragma cache_size"), [(-1000,)])
+
+        # a timeout given to sqlite3.connect is kept
+        async with aiosqlite.connect(self.db, profile="bulk_load", timeout=1) as db:
+            self.assertNotIn("busy_timeout", db.pragmas)
+            self.assertEqual(db.pragmas["synchronous"], 0)
+            self.assertEqual(
+                await db.execute_fetchall("pragma busy_timeout"), [(1000,)]
+            )
+
+        async with aiosqlite.connect(
+            ":memory:", profile="ephemeral", pragmas={"foreign_keys": True}
+        ) as db:
+            self.assertEqual(db.pragmas["journal_mode"], "memory")
+            self.assertEqual(db.pragmas["foreign_keys"], 1)
+
+        with self.assertRaisesRegex(ValueError, "unknown profile"):
+            aiosqlite.connect(self.db, profile="fast")
+        with self.assertRaisesRegex(ValueError, "invalid pragma name"):
+            aiosqlite.connect(self.db, pragmas={"cache_size = 1; drop": 1})
+        with self.assertRaisesRegex(ValueError, "invalid pragma value"):
+            aiosqlite.connect(self.db, pragmas={"journal_mode": "wal; drop"})
+
+    async def test_shared_executor(self):
+        with self.assertRaises(ValueError):
+            aiosqlite.SharedExecutor(0)
+
+        with TemporaryDirectory() as td, aiosqlite.SharedExecutor(2) as executor:
+            paths = [Path(td) / f"tenant-{i}.db" for i in range(6)]
+            dbs = [
+                await aiosqlite.connect(path, executor=executor, isolation_level=None)
+                for path in paths
+            ]
+            try:
+
+                async def work(db):
+                    await db.execute("create table foo (i integer)")
+                    await asyncio.gather(
+                        *(
+                            db.execute("insert into foo values (?)", [i])
+                            for i in range(20)
+                        )
+                    )
+                    await db.bulk_insert("foo", [(i,) for i in range(20, 40)], ["i"])
+                    return await db.execute_fetchall("select i from foo")
+
+                results = await asyncio.gather(*(work(db) for db in dbs))
+                for rows in results:
+                    # calls on each connection still run in order
+                    self.assertEqual(rows, [(i,) for i in range(40)])
+                self.assertLessEqual(executor.threads, 2)
+            finally:
+                for db in dbs:
+                    await db.close()
+
+            # threads are reused by new connections
+            threads = executor.threads
+            async with aiosqlite.connect(paths[0], executor=executor) as db:
+                self.assertEqual(
+                    await db.execute_fetchall("select count(*) from foo"), [(40,)]
+                )
+            self.assertEqual(executor.threads, threads)
+
+            # a second connection to the same file is warned about, until the
+            # first is closed
+            async with aiosqlite.connect(paths[0], executor=executor):
+                with self.assertWarnsRegex(RuntimeWarning, "2 connections"):
+                    db = await aiosqlite.connect(paths[0], executor=executor)
+            await db.close()
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                async with aiosqlite.connect(paths[0], executor=executor):
+                    pass
+
+        with self.assertRaisesRegex(RuntimeError, "shut down"):
+            await aiosqlite.connect(":memory:", executor=executor)
+
+    async def test_sharded_database(self):
+        with self.assertRaises(ValueError):
+            aiosqlite.ShardedDatabase([])
+        with self.assertRaises(ValueError):
+            aiosqlite.ShardedDatabase(["a.db", "b.db"], boundaries=[1, 2])
+        with self.assertRaises(ValueError):
+            aiosqlite.ShardedDatabase(["a.db", "b.db", "c.db"], boundaries=[2, 1])
+
+        with TemporaryDirectory() as td:
+            paths = [Path(td) / f"shard-{i}.db" for i in range(3)]
+            async with aiosqlite.ShardedDatabase(paths) as db:
+                self.assertEqual(len(db), 3)
+                await db.execute_all("create table foo (i integer, k text)")
+                for i in range(30):
+                    await db.execute(i, "insert into foo values (?, ?)", [i, str(i)])
+                await db.commit()
+
+                # every shard holds some keys, and each key is on its own shard
+                for index, shard in enumerate(db.shards):
+                    rows = await shard.execute_fetchall("select i from foo")
+                    self.assertTrue(rows)
+                    for (i,) in rows:
+                        self.assertEqual(db.shard_for(i), index)
+                self.assertEqual(
+                    await db.execute_fetchall(7, "select k from foo where i = 7"),
+                    [("7",)],
+                )
+
+                rows = [row async for row in db.scatter("select i from foo")]
+                self.assertEqual(sorted(rows), [(i,) for i in range(30)])
+                rows = [
+                    row
+                    async for row in db.scatter(
+                        "select i from foo where i >= ? order by i",
+                        [10],
+                        key=lambda row: row[0],
+                    )
+                ]
+                self.assertEqual(rows, [(i,) for i in range(10, 30)])
+
+                # stopping early, and errors from any shard
+                async for _ in db.scatter("select i from foo"):
+                    break
+                with self.assertRaises(OperationalError):
+                    async for _ in db.scatter("select * from missing"):
+                        pass
+
+            async with aiosqlite.ShardedDatabase(
+                paths, boundaries=[10, 20], isolation_level=None
+            ) as db:
+                self.assertEqual(
+                    [db.shard_for(key) for key in (0, 9, 10, 19, 20, 99)],
+                    [0, 0, 1, 1, 2, 2],
+                )
+                await db.execute_all("create table bar (i integer)")
+                await db.executemany(15, "insert into bar values (?)", [(15,), (16,)])
+                rows = await db.shards[1].execute_fetchall("select i from bar")
+                self.assertEqual(rows, [(15,), (16,)])
+
+    async def test_cancellation(self):
+        async with aiosqlite.connect(self.db, isolation_level=None) as db:
+            await db.execute("create table foo (i integer)")
+
+            # cancelled while queued: skipped by the connection thread
+            started, gate = Event(), Event()
+            blocked = db._submit(lambda: started.set() or gate.wait())
+            started.wait()
+            insert = asyncio.ensure_future(db.execute("insert into foo values (1)"))
+            await asyncio.sleep(0)
+            insert.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await insert
+            gate.set()
+            await blocked
+            self.assertEqual(await db.execute_fetchall("select * from foo"), [])
+
+            # cancelled while running: only that query is aborted, while an
+            # open cursor and later queries are unaffected
+            await db.executemany("insert into foo values (?)", [(1,), (2,)])
+            cursor = await db.execute("select i from foo order by i")
+            self.assertEqual(await cursor.fetchone(), (1,))
+            forever = (
+                "with recursive c(x) as (select 1 union all select x + 1 from c) "
+                "select count(*) from c"
+            )
+            query = asyncio.ensure_future(db.execute_fetchall(forever))
+            await asyncio.sleep(0.05)
+            before = time.monotonic()
+            query.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await query
+            self.assertEqual(await db.execute_fetchall("select 1"), [(1,)])
+            self.assertEqual(await cursor.fetchone(), (2,))
+            await cursor.close()
+            self.assertLess(time.monotonic() - before, 1)
+            await db.execute("delete from foo")
+
+            # abandoned incremental backups stop copying
+            await db.execute(
+                "with recursive c(x) as (select 1 union all select x + 1 from c "
+                "limit 2000) insert into foo select x from c"
+            )
+            target = sqlite3.connect(":memory:", check_same_thread=False)
+            try:
+                backup = db.iterbackup(target, pages=1, sleep=0)
+                await backup.__anext__()
+                await backup.aclose()
+                self.assertEqual(await db.execute_fetchall("select 1"), [(1,)])
+            finally:
+                target.close()
+
+        # skipped calls no longer count towards the queue depth
+        async with aiosqlite.connect(self.db, record_latency=True) as db:
+            started, gate = Event(), Event()
+            blocked = db._submit(lambda: started.set() or gate.wait())
+            started.wait()
+            queries = [
+                asyncio.ensure_future(db.execute_fetchall("select 1"))
+                for _ in range(10)
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(db.latency_stats().queue_depth, 10)
+            for query in queries:
+                query.cancel()
+            await asyncio.gather(*queries, return_exceptions=True)
+            gate.set()
+            await blocked
+            await db.execute_fetchall("select 1")
+            self.assertEqual(db.latency_stats().queue_depth, 0)
+
+    async def test_slow_query_log(self):
+        queries = []
+        with self.assertLogs("aiosqlite", "WARNING") as logs:
+            async with aiosqlite.connect(
+                self.db, slow_query_threshold=0, slow_query_callback=queries.append
+            ) as db:
+                await db.execute("create table foo (i integer, k text)")
+                await db.execute("create index foo_i on foo (i)")
+                await db.executemany(
+                    "insert into foo values (?, ?)", [(i, str(i)) for i in range(5)]
+                )
+                queries.clear()
+                del logs.output[:]
+
+                await db.execute_fetchall("select * from foo where k = ?", ["1"])
+                self.assertIn("full scan of foo", logs.output[0])
+
+                await db.execute_fetchall("select * from foo where i = :i", {"i": 1})
+                cursor = await db.cursor()
+                await cursor.executemany(
+                    "update foo set k = ? where i = ?", [("a", 1), ("b", 2)]
+                )
+
+                # plans are explained the same way whatever the row factory
+                db.row_factory = lambda cursor, row: dict(sqlite3.Row(cursor, row))
+                await db.execute_fetchall("select * from foo where i = ?", [2])
+
+                scan, search, update, search_dict = queries
+                self.assertEqual(scan.sql, "select * from foo where k = ?")
+                self.assertEqual(scan.parameters, "(1)")
+                self.assertEqual(scan.rows, 1)
+                self.assertEqual(scan.full_scans, ["foo"])
+                self.assertTrue(scan.full_scan)
+                self.assertGreaterEqual(scan.duration, 0)
+
+                self.assertEqual(search.parameters, "{:i}")
+                self.assertFalse(search.full_scan)
+                self.assertIn("foo_i", search.plan[0])
+
+                self.assertEqual(update.parameters, "2 x (2)")
+                self.assertEqual(update.rows, 2)
+                self.assertFalse(update.full_scan)
+
+                self.assertEqual(search_dict.plan, search.plan)
+
+        queries.clear()
+        async with aiosqlite.connect(
+            self.db, slow_query_threshold=60, slow_query_callback=queries.append
+        ) as db:
+            await db.execute_fetchall("select * from foo")
+        self.assertEqual(queries, [])
+
+    async def test_statement_stats(self):
+        self.assertEqual(
+            aiosqlite.normalize_sql("select * from foo\n where k in (1, 2, 'a''b')"),
+            "select * from foo where k in (?, ...)",
+        )
+        self.assertEqual(
+            aiosqlite.normalize_sql('insert into "t 1" values (1, ?), (2,?) -- x'),
+            'insert into "t 1" values (?, ...), ...',
+        )
+
+        async with aiosqlite.connect(self.db) as db:
+            self.assertIsNone(db.statement_stats())
+
+        async with aiosqlite.connect(self.db, track_statements=True) as db:
+            await db.execute("create table foo (k integer)")
+            await db.executemany("insert into foo values (?)", [[1], [2], [3]])
+            for k in range(3):
+                await db.execute_fetchall(f"select * from foo where k > {k}")
+            with self.assertRaises(sqlite3.OperationalError):
+                await db.execute("select * from bar")
+
+            stats = {s.sql: s for s in db.statement_stats()}
+            self.assertEqual(len(stats), 4)
+
+            select = stats["select * from foo where k > ?"]
+            self.assertEqual((select.calls, select.rows, select.errors), (3, 6, 0))
+            self.assertGreaterEqual(select.max_time, select.mean_time)
+            self.assertAlmostEqual(select.total_time, select.mean_time * 3)
+
+            insert = stats["insert into foo values (?)"]
+            self.assertEqual((insert.calls, insert.rows), (1, 3))
+
+            error = stats["select * from bar"]
+            self.assertEqual((error.calls, error.errors), (1, 1))
+
+            # statements run by pipelines are recorded too
+            async with db.pipeline() as pipe:
+                pipe.execute("delete from foo where k = ?", [1])
+            stats = {s.sql: s for s in db.statement_stats()}
+            delete = stats["delete from foo where k = ?"]
+            self.assertEqual((delete.calls, delete.rows), (1, 1))
+
+            db.reset_statement_stats()
+            self.assertEqual(db.statement_stats(), [])
+
+    def test_bench(self):
+        from aiosqlite import bench
+
+        results = bench.run(["select_one"], duration=0.02, warmup=0, rows=100)
+        names = [result.name for result in results]
+        self.assertEqual(
+            names, ["sqlite3_select_one", "select_one", "select_one_fetchall"]
+        )
+        for result in results:
+            self.assertGreater(result.iterations, 0)
+            self.assertLessEqual(result.min, result.p50)
+            self.assertLessEqual(result.p50, result.p95)
+            self.assertLessEqual(result.p95, result.p99)
+            self.assertLessEqual(result.p99, result.max)
+        self.assertEqual(
+            list(bench.overhead(results)), ["select_one", "select_one_fetchall"]
+        )
+
+        path = self.db.with_suffix(".json")
+        bench.dump(results, path)
+        baseline = bench.load(path)
+        self.assertEqual(baseline["select_one"], results[1])
+        self.assertEqual(bench.compare(results, baseline), [])
+
+        (result,) = bench.run(["load_16_tasks"], duration=0.05, warmup=0, rows=100)
+        self.assertEqual(result.group, "load")
+        self.assertEqual(result.extra["tasks"], 16)
+        self.assertGreater(result.extra["queue_depth"]["max"], 0)
+        self.assertLessEqual(result.extra["queue_depth"]["max"], 16)
+
+        fetchall, iterate = bench.run(
+            ["memory_fetchall", "memory_iterate_64"],
+            duration=0,
+            warmup=0,
+            rows=200,
+        )
+        self.assertEqual(fetchall.extra["rows"], 2000)
+        self.assertGreater(fetchall.extra["peak_bytes"], iterate.extra["peak_bytes"])
+        self.assertLess(fetchall.extra["steady_bytes"], fetchall.extra["peak_bytes"])
+
+        memory = {"memory_fetchall": replace(fetchall)}
+        memory["memory_fetchall"].extra = {"peak_bytes": 1, "steady_bytes": 1}
+        metrics = [r.metric for r in bench.compare([fetchall], memory, threshold=9)]
+        self.assertEqual(metrics, ["peak_bytes", "steady_bytes"])
+
+        baseline["select_one"].p50 /= 2
+        (regression,) = bench.compare(results, baseline, threshold=0.5)
+        self.assertEqual(regression.name, "select_one")
+        self.assertAlmostEqual(regression.change, 1.0)
+
     async def test_multi_loop_usage(self):
         results = {}
 
@@ -426,6 +1278,30 @@ class SmokeTest(IsolatedAsyncioTestCase):
                 ],
             )
 
+    async def test_iterdump_batches(self):
+        async with aiosqlite.connect(":memory:", iter_chunk_size=3) as db:
+            await db.execute("create table foo (i integer)")
+            await db.executemany("insert into foo values (?)", [[i] for i in range(9)])
+
+            # BEGIN, CREATE, 9 INSERTs, COMMIT: exactly four full batches
+            lines = [line async for line in db.iterdump()]
+            self.assertEqual(len(lines), 12)
+            self.assertEqual(lines[-1], "COMMIT;")
+
+            async for line in db.iterdump():
+                if line.startswith("INSERT"):
+                    break
+
+            # other queries run between batches, and after abandoning a dump
+            dump = db.iterdump()
+            self.assertEqual(await dump.__anext__(), "BEGIN TRANSACTION;")
+            rows = await db.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(9,)])
+            await dump.aclose()
+
+            rows = await db.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(9,)])
+
     async def test_cursor_on_closed_connection(self):
         db = await aiosqlite.connect(self.db)
 
@@ -511,6 +1387,74 @@ class SmokeTest(IsolatedAsyncioTestCase):
                 rows = cursor.fetchall()
                 self.assertEqual(rows, [(1, "hello"), (2, "world")])
 
+    async def test_iterbackup(self):
+        async with (
+            aiosqlite.connect(":memory:") as db1,
+            aiosqlite.connect(":memory:") as db2,
+        ):
+            await db1.execute("create table foo (i integer, k text)")
+            await db1.executemany(
+                "insert into foo values (?, ?)", [(i, "x" * 500) for i in range(100)]
+            )
+            await db1.commit()
+
+            with self.assertRaises(ValueError):
+                async for _ in db1.iterbackup(db2, pages=0):
+                    pass
+
+            # progress and queries are both recorded on the connection thread
+            events = []
+
+            def record_step(*args):
+                events.append("step")
+                return aiosqlite.BackupProgress(*args)
+
+            with patch("aiosqlite.core.BackupProgress", side_effect=record_step):
+                # hold the connection thread until both backup and query are queued
+                gate = Event()
+                blocker = asyncio.ensure_future(db1.run(lambda conn: gate.wait()))
+                backup = db1.iterbackup(db2, pages=2)
+                first = asyncio.ensure_future(backup.__anext__())
+                query = asyncio.ensure_future(
+                    db1.run(lambda conn: events.append("query"))
+                )
+                await asyncio.sleep(0)
+                gate.set()
+
+                await asyncio.gather(blocker, query)
+                steps = [await first] + [progress async for progress in backup]
+
+            # the query ran between backup steps, not after the whole backup
+            self.assertIn("step", events[events.index("query") :])
+            self.assertGreater(len(steps), 2)
+            self.assertGreater(steps[1].remaining, 0)
+            self.assertEqual(steps[-1].remaining, 0)
+            self.assertEqual(steps[-1].copied, steps[-1].total)
+
+            rows = await db2.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(100,)])
+
+        # closing waits for the backup to finish, rather than running between steps
+        async with aiosqlite.connect(":memory:") as db2:
+            db1 = await aiosqlite.connect(":memory:")
+            await db1.execute("create table foo (i integer, k text)")
+            await db1.executemany(
+                "insert into foo values (?, ?)", [(i, "x" * 500) for i in range(1000)]
+            )
+            await db1.commit()
+
+            events.clear()
+            with patch("aiosqlite.core.BackupProgress", side_effect=record_step):
+                backup = db1.iterbackup(db2, pages=1, sleep=0)
+                first = await backup.__anext__()
+                self.assertGreater(first.remaining, 0)
+                await db1.close()
+                self.assertEqual(len(events), first.total)
+                steps = [first] + [progress async for progress in backup]
+            self.assertEqual(steps[-1].remaining, 0)
+            rows = await db2.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(1000,)])
+
     async def test_emits_warning_when_left_open(self):
         db = await aiosqlite.connect(":memory:")
 
@@ -535,3 +1479,210 @@ class SmokeTest(IsolatedAsyncioTestCase):
         loop.close()
 
         db.stop()
+
+    async def test_pipeline(self):
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute("create table foo (i integer primary key asc, k integer)")
+
+            async with db.pipeline() as pipe:
+                self.assertEqual(pipe.execute("insert into foo (k) values (?)", [5]), 0)
+                pipe.execute("select last_insert_rowid()")
+                pipe.fetchone()
+                pipe.executemany("insert into foo (k) values (?)", [[6], [7]])
+                pipe.execute("select k from foo order by k")
+                pipe.fetchall()
+                pipe.commit()
+
+            cursor, _, rowid, many, _, rows, committed = pipe.results
+            self.assertIsInstance(cursor, aiosqlite.Cursor)
+            self.assertEqual(cursor.lastrowid, 1)
+            self.assertEqual(rowid, (1,))
+            self.assertEqual(many.rowcount, 2)
+            self.assertEqual(rows, [(5,), (6,), (7,)])
+            self.assertIsNone(committed)
+            self.assertFalse(db.in_transaction)
+
+            with self.assertRaisesRegex(ValueError, "already run"):
+                pipe.commit()
+
+            pipe = db.pipeline()
+            pipe.execute("insert into foo (k) values (8)")
+            pipe.execute("insert into bar (k) values (9)")
+            pipe.commit()
+            with self.assertRaises(aiosqlite.PipelineError) as cm:
+                await pipe.run()
+            self.assertEqual(cm.exception.index, 1)
+            self.assertIsInstance(cm.exception.__cause__, OperationalError)
+            self.assertEqual(len(cm.exception.results), 1)
+            await db.rollback()
+
+            pipe = db.pipeline()
+            pipe.fetchone()
+            with self.assertRaises(aiosqlite.PipelineError) as cm:
+                await pipe.run()
+            self.assertIsInstance(cm.exception.__cause__, sqlite3.ProgrammingError)
+
+    async def test_run(self):
+        def insert(conn, *values, table):
+            for value in values:
+                conn.execute(f"insert into {table} (k) values (?)", [value])
+            return conn.execute(f"select count(*) from {table}").fetchone()[0]
+
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute("create table foo (k integer)")
+            self.assertEqual(await db.run(insert, 1, 2, table="foo"), 2)
+            self.assertTrue(db.in_transaction)
+            await db.commit()
+
+            with self.assertRaises(OperationalError):
+                await db.run(insert, 3, table="bar")
+
+    async def test_transaction_sync(self):
+        def insert(conn, value):
+            conn.execute("insert into foo (k) values (?)", [value])
+            if value < 0:
+                raise ValueError("negative")
+            return value
+
+        async with aiosqlite.connect(self.db) as db:
+            await db.execute("create table foo (k integer)")
+            await db.commit()
+
+            self.assertEqual(await db.transaction_sync(insert, 1), 1)
+            self.assertFalse(db.in_transaction)
+
+            with self.assertRaisesRegex(ValueError, "negative"):
+                await db.transaction_sync(insert, -1)
+            self.assertFalse(db.in_transaction)
+
+            # an open transaction is joined, and only the call is rolled back
+            await db.execute("insert into foo (k) values (10)")
+            self.assertEqual(await db.transaction_sync(insert, 11), 11)
+            with self.assertRaisesRegex(ValueError, "negative"):
+                await db.transaction_sync(insert, -2)
+            self.assertTrue(db.in_transaction)
+            rows = await db.execute_fetchall("select k from foo")
+            self.assertEqual(rows, [(1,), (10,), (11,)])
+            await db.rollback()
+            self.assertEqual(await db.execute_fetchall("select k from foo"), [(1,)])
+
+        async with aiosqlite.connect(self.db, isolation_level=None) as db:
+            self.assertEqual(await db.transaction_sync(insert, 2), 2)
+            self.assertFalse(db.in_transaction)
+
+            rows = await db.execute_fetchall("select k from foo")
+            self.assertEqual(rows, [(1,), (2,)])
+
+    async def test_pool_routing(self):
+        async with aiosqlite.create_pool(self.db, min_size=1, max_size=2) as pool:
+            await pool.execute("create table foo (i integer, k integer)")
+            await pool.executemany("insert into foo values (?, ?)", [(1, 2), (3, 4)])
+
+            rows = await pool.execute_fetchall("select * from foo order by i")
+            self.assertEqual(rows, [(1, 2), (3, 4)])
+
+            async with pool.read() as conn:
+                (mode,) = (await conn.execute_fetchall("pragma journal_mode"))[0]
+                self.assertEqual(mode, "wal")
+                with self.assertRaisesRegex(OperationalError, "readonly"):
+                    await conn.execute("insert into foo values (5, 6)")
+
+            async with pool.write() as conn:
+                await conn.execute("insert into foo values (5, 6)")
+
+            rows = await pool.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(3,)])
+
+            with self.assertRaises(RuntimeError):
+                async with pool.write() as conn:
+                    await conn.execute("insert into foo values (7, 8)")
+                    raise RuntimeError("abort")
+
+            rows = await pool.execute_fetchall("select count(*) from foo")
+            self.assertEqual(rows, [(3,)])
+
+            # writes that return rows are committed
+            cursor = await pool.execute("insert into foo values (7, 8) returning i")
+            self.assertEqual(cursor.rowcount, 1)
+            rows = await pool.execute_fetchall(
+                "insert into foo values (9, 10) returning i"
+            )
+            self.assertEqual(rows, [(9,)])
+
+            # a failed commit is rolled back, releasing the writer
+            with self.assertRaisesRegex(OperationalError, "in progress"):
+                async with pool.write() as conn:
+                    await conn.execute("insert into foo values (11, 12) returning i")
+            self.assertFalse(pool._writer.in_transaction)
+
+            rows = await pool.execute_fetchall("select i from foo where i > 5")
+            self.assertEqual(rows, [(7,), (9,)])
+
+        with self.assertRaisesRegex(ValueError, "Pool closed"):
+            async with pool.read():
+                pass
+
+    async def test_pool_sizing(self):
+        with self.assertRaises(ValueError):
+            aiosqlite.create_pool(":memory:")
+        with self.assertRaises(ValueError):
+            aiosqlite.create_pool(self.db, min_size=3, max_size=2)
+
+        pool = await aiosqlite.create_pool(
+            self.db, min_size=0, max_size=2, idle_timeout=0
+        )
+        try:
+            entered = asyncio.Event()
+            release = asyncio.Event()
+
+            async def hold():
+                async with pool.read() as conn:
+                    entered.set()
+                    await release.wait()
+                    return await conn.execute_fetchall("select 1")
+
+            holders = [asyncio.ensure_future(hold()) for _ in range(2)]
+            await entered.wait()
+            waiter = asyncio.ensure_future(pool.execute_fetchall("select 2"))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            self.assertEqual(pool.stats().size, 2)
+
+            release.set()
+            self.assertEqual(await waiter, [(2,)])
+            await asyncio.gather(*holders)
+
+            stats = pool.stats()
+            self.assertEqual(stats.acquisitions, 3)
+            self.assertEqual(stats.waits, 1)
+            self.assertGreater(stats.max_wait_time, 0)
+            self.assertEqual(stats.size, 0)  # idle readers pruned
+        finally:
+            await pool.close()
+
+        # idle readers are pruned without further traffic
+        async with aiosqlite.create_pool(
+            self.db, min_size=1, max_size=3, idle_timeout=0.05
+        ) as pool:
+
+            async def read():
+                async with pool.read() as conn:
+                    await asyncio.sleep(0.01)
+                    return await conn.execute_fetchall("select 1")
+
+            await asyncio.gather(read(), read(), read())
+            self.assertEqual(pool.stats().size, 3)
+            await asyncio.sleep(0.2)
+            self.assertEqual(pool.stats().size, 1)
+
+            # writer waits are tracked alongside reader waits
+            async def write():
+                async with pool.write() as conn:
+                    await asyncio.sleep(0.01)
+                    await conn.execute("pragma user_version = 1")
+
+            await asyncio.gather(write(), write())
+            stats = pool.stats()
+            self.assertEqual((stats.write_acquisitions, stats.write_waits), (2, 1))
+            self.assertGreater(stats.max_write_wait_time, 0)
+            self.assertGreater(stats.mean_write_wait_time, 0)